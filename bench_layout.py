@@ -0,0 +1,249 @@
+"""
+Headless benchmark and checks of the row layout stage.
+Rows are laid out, diffed and applied through the real BaseWidget.update and TkBackend
+to a recording canvas instead of Tk, so layout can be checked and measured without a display.
+Reports the update time per row and the canvas calls each scroll step sends, then checks
+that the recorded canvas matches the display list of every row.
+
+Usage: python bench_layout.py [--systems N] [--mode Simple|Fancy] [--steps N]
+"""
+
+import sys
+import time
+import random
+import argparse
+import logging
+import tempfile
+import statistics
+
+from bench_replay import installFakeEDMC
+
+#point size of a 96 dpi display
+POINT_SIZE = 96/72
+#size of the board in points, like SIZE
+BOARD_SIZE = 200
+STAR_CLASSES = ("K", "G", "M", "F", "A", "B", "O", "N", "H", "DA", "L", "T", "TTS")
+
+class RecordingCanvas:
+    """
+    The canvas calls used by TkBackend, keeps the items in memory and counts every call.
+    """
+
+    def __init__(self):
+        #item id: {"coords": list, "options": dict, "tags": tuple}
+        self.items = {}
+        #item id: {sequence: handler}
+        self.bindings = {}
+        #method name: number of calls
+        self.calls = {}
+        self.lastID = 0
+
+    def count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def find(self, tagOrID):
+        if tagOrID in self.items: return [tagOrID]
+        return [item for item, v in self.items.items() if tagOrID in v["tags"]]
+
+    def create(self, name, coords, options):
+        self.count(name)
+        self.lastID += 1
+        options = dict(options)
+        tags = options.pop("tags", ())
+        self.items[self.lastID] = {"coords": list(coords), "options": options, "tags": (tags,) if isinstance(tags, str) else tuple(tags)}
+        self.bindings[self.lastID] = {}
+        return self.lastID
+
+    def create_text(self, *coords, **options): return self.create("create_text", coords, options)
+    def create_line(self, *coords, **options): return self.create("create_line", coords, options)
+    def create_rectangle(self, *coords, **options): return self.create("create_rectangle", coords, options)
+
+    def coords(self, item, *coords):
+        self.count("coords")
+        self.items[item]["coords"] = list(coords)
+
+    def itemconfig(self, item, **options):
+        self.count("itemconfig")
+        if "tags" in options: self.items[item]["tags"] = tuple(options.pop("tags"))
+        self.items[item]["options"].update(options)
+
+    def move(self, tagOrID, dx, dy):
+        self.count("move")
+        for item in self.find(tagOrID):
+            coords = self.items[item]["coords"]
+            self.items[item]["coords"] = [value+(dy if i % 2 else dx) for i, value in enumerate(coords)]
+
+    def tag_raise(self, tagOrID): self.count("tag_raise")
+
+    def tag_bind(self, item, sequence, handler):
+        self.count("tag_bind")
+        self.bindings[item][sequence] = handler
+        return f"cmd{id(handler)}{sequence}"
+
+    def tag_unbind(self, item, sequence, funcid=None):
+        self.count("tag_unbind")
+        self.bindings[item].pop(sequence, None)
+
+    def delete(self, tagOrID):
+        self.count("delete")
+        for item in self.find(tagOrID):
+            del self.items[item]
+            del self.bindings[item]
+
+    def deletecommand(self, funcid): self.count("deletecommand")
+
+def makeRoute(Route, RouteSystem, count):
+    rand = random.Random(count)
+    systems = []
+    pos = (0.0, 0.0, 0.0)
+    for i in range(count):
+        pos = (pos[0]+rand.uniform(20, 60), pos[1]+rand.uniform(-5, 5), pos[2]+rand.uniform(-5, 5))
+        #a few long names to exercise the text fitting
+        name = f"LAYOUT TEST {i:05}" if i % 7 else f"Outer Orion Spur Sector AB-C d{i:05}"
+        systems.append(RouteSystem(name, 2000000+i, pos, rand.choice(STAR_CLASSES)))
+    return Route(systems)
+
+def makeBoard(route, TextFitter, colors):
+    class ApproxFitter(TextFitter):
+        #glyphs are about 0.6 of the font size wide, no Tk font needed
+        def measure(self, text, font): return len(text)*font[1]*POINT_SIZE*0.6
+
+    class LayoutBoard:
+        #the parts of a board used by the rows
+        def __init__(self):
+            self.route = route
+            self.thargoidSystems = {}
+            self.colors = colors
+            self.textFitter = ApproxFitter(None)
+            self.size = self.pt(BOARD_SIZE)
+
+        def pt(self, points): return points*POINT_SIZE
+
+    return LayoutBoard()
+
+def getMismatches(row, canvas):
+    """
+    :return: Differences between the display list of the row and its items on the canvas
+    """
+    mismatches = []
+    if set(row.objs) != set(row.displayList): mismatches.append(f"items {sorted(row.objs)} != {sorted(row.displayList)}")
+    for name, primitive in row.displayList.items():
+        item = row.objs.get(name)
+        if item not in canvas.items: continue
+        drawn = canvas.items[item]
+        if any(abs(a-b) > 1e-6 for a, b in zip(drawn["coords"], primitive.coords)) or len(drawn["coords"]) != len(primitive.coords):
+            mismatches.append(f"{name} coords {drawn['coords']} != {primitive.coords}")
+        options = {key: value for key, value in primitive.options.items() if key != "tags"}
+        if drawn["options"] != options:
+            mismatches.append(f"{name} options {drawn['options']} != {options}")
+        if row.backend.tag not in drawn["tags"]: mismatches.append(f"{name} without the row tag")
+        if canvas.bindings[item] != primitive.events: mismatches.append(f"{name} events {canvas.bindings[item]} != {primitive.events}")
+    return mismatches
+
+def runChecks(Row, board, route, rowHeight, display):
+    """
+    :return: Failed checks
+    """
+    failures = []
+    canvas = RecordingCanvas()
+    row = Row(board, canvas, 0, 0, board.size, rowHeight, 1, route[0], distance=40.0)
+    row.draw()
+    failures += [f"draw: {mismatch}" for mismatch in getMismatches(row, canvas)]
+
+    #a distance change only configures the distance text
+    old = row.layout()
+    row.setDistance(80.0)
+    ops = display.diffDisplayList(old, row.layout())
+    if ops != [(display.CONFIG, "distance", {"text": "80.00 Ly"})]: failures.append(f"distance change: {ops}")
+
+    #a primitive which drops an option is recreated so the item doesn't keep it
+    dropped = {name: primitive._replace(options={key: value for key, value in primitive.options.items() if key != "text"}) for name, primitive in old.items()}
+    ops = display.diffDisplayList(old, dropped)
+    if [op[0] for op in ops if op[1] == "distance"] != [display.DELETE, display.CREATE]: failures.append(f"dropped option: {ops}")
+
+    #a laid out row shifted by dy is the row laid out dy lower
+    shifted = display.shiftDisplayList(old, rowHeight)
+    row.setDistance(40.0)
+    row.setPos(0, rowHeight)
+    if shifted != row.layout(): failures.append("shifted display list differs from the layout at the new position")
+
+    #a pure vertical move is one canvas call
+    canvas.calls.clear()
+    row.update()
+    if canvas.calls != {"move": 1}: failures.append(f"pure move: {canvas.calls}")
+    failures += [f"move: {mismatch}" for mismatch in getMismatches(row, canvas)]
+
+    #an unchanged row sends nothing
+    canvas.calls.clear()
+    if row.update() or canvas.calls: failures.append(f"unchanged row: {canvas.calls}")
+
+    #clearing removes every item with one delete by the row tag
+    row.clear()
+    if canvas.items: failures.append(f"clear left {len(canvas.items)} items")
+    return failures
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Headless benchmark and checks of the row layout.")
+    parser.add_argument("--systems", type=int, default=2000, help="route length")
+    parser.add_argument("--mode", default="Fancy", choices=("Simple", "Fancy"))
+    parser.add_argument("--steps", type=int, default=500, help="scroll steps of one row")
+    parser.add_argument("--pool", type=int, default=12, help="rows in the pool")
+    args = parser.parse_args(argv[1:])
+    logging.basicConfig(level=logging.CRITICAL)
+
+    installFakeEDMC(tempfile.mkdtemp(prefix="nextstop-layout-"), args.mode)
+    from nextstop.route import Route, RouteSystem
+    from nextstop.ui.constant import THEME1933
+    from nextstop.ui.textfit import TextFitter
+    from nextstop.ui import display
+    from nextstop.ui.rows import SimpleRow, FancyRow
+
+    route = makeRoute(Route, RouteSystem, args.systems)
+    board = makeBoard(route, TextFitter, THEME1933)
+    Row = FancyRow if args.mode == "Fancy" else SimpleRow
+    rowHeight = board.pt(40)
+    pool = min(args.pool, len(route))
+    steps = min(args.steps, len(route)-pool)
+
+    failures = runChecks(Row, board, route, rowHeight, display)
+
+    def setRow(row, routeIndex):
+        system = route[routeIndex]
+        row.setPos(0, rowHeight*routeIndex)
+        row.setIndex(routeIndex+1)
+        row.setSystem(system, route.getEnrichment(system.id64))
+        row.setDistance(routeIndex*40.0)
+        row.showBottomLine(routeIndex+1 < len(route))
+
+    canvas = RecordingCanvas()
+    rows = []
+    for i in range(pool):
+        row = Row(board, canvas, 0, 0, board.size, rowHeight, i+1, route[i])
+        setRow(row, i)
+        row.draw()
+        rows.append(row)
+
+    updateTimes = []
+    canvas.calls.clear()
+    for step in range(1, steps+1):
+        #scroll down one row, the first row is recycled for the new last one like rotateRows
+        rows.append(rows.pop(0))
+        for i, row in enumerate(rows):
+            setRow(row, step+i)
+            startTime = time.perf_counter()
+            if row.update(): updateTimes.append(time.perf_counter()-startTime)
+    calls = dict(canvas.calls)
+    for row in rows:
+        failures += [f"row {row.index}: {mismatch}" for mismatch in getMismatches(row, canvas)]
+
+    print(f"{args.mode} rows, {pool} in the pool, {len(rows[0].displayList)} primitives each, {steps} scroll steps")
+    if updateTimes:
+        updateTimes.sort()
+        print(f"update  mean {statistics.fmean(updateTimes)*1e6:8.1f}us  p95 {updateTimes[int(len(updateTimes)*0.95)]*1e6:8.1f}us per updated row")
+    print(f"canvas calls per scroll step: " + ", ".join(f"{name} {count/max(steps, 1):.1f}" for name, count in sorted(calls.items())))
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
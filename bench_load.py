@@ -0,0 +1,236 @@
+"""
+Load tests for the EDSM worker against the local stand-in server.
+Every scenario runs EDSMworker on its own server with injected latency, rate limits, 429 bursts,
+server errors, stalls or dropped connections, then checks the results, throughput, retries and cancellation.
+
+Usage: python bench_load.py [--systems N] [--only NAME]
+"""
+
+import sys
+import os
+import time
+import math
+import argparse
+import logging
+import tempfile
+from os import path
+from threading import Thread, Event, Lock
+import tkinter as tk
+
+from standin_server import StandInServer
+from bench_replay import installFakeEDMC
+
+#seconds a worker may take to notice a cancellation
+CANCEL_GRACE = 1.0
+
+class WorkerApp:
+    """
+    The parts of NextStop used by the EDSM worker, without Tk.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        #(time, version, patch) in the order they were pushed
+        self.patches = []
+        #id64: star type
+        self.cache = {}
+        self.lookupQueue = None
+        self.lookupFocus = (0, (0, -1))
+
+    def getManyFromCache(self, ids):
+        with self.lock:
+            return {id64: self.cache[id64] for id64 in ids if id64 in self.cache}
+
+    def updateManyCache(self, items):
+        with self.lock:
+            self.cache.update(items)
+
+    def pushPatch(self, version, patch):
+        with self.lock:
+            self.patches.append((time.perf_counter(), version, patch))
+
+    def getResults(self):
+        results = {}
+        with self.lock:
+            for _, _, patch in self.patches:
+                for id64, (starType, _) in patch.items():
+                    results[id64] = starType
+        return results
+
+class Scenario:
+
+    def __init__(self, name, systems, setup=None, stopAfter=None, expect="complete", maxRequests=None, backoff=(0.05, 0.5), timeout=(2, 5)):
+        """
+        :param setup: Called with the server before the worker starts
+        :param stopAfter: Seconds before the worker is cancelled, None = run to the end
+        :param expect: "complete", "cancelled" or "giveUp"
+        :param backoff: BACKOFF_BASE and BACKOFF_CAP of the run
+        :param timeout: Connect and read timeout of the client
+        """
+        self.name = name
+        self.systems = systems
+        self.setup = setup
+        self.stopAfter = stopAfter
+        self.expect = expect
+        self.maxRequests = maxRequests
+        self.backoff = backoff
+        self.timeout = timeout
+
+def makeRoute(server, count):
+    """
+    Every 10th system is unknown to the server and must end up as a negative cache entry.
+    :return: List of (id64, system name) and id64: expected star type
+    """
+    systems = []
+    expected = {}
+    rows = []
+    for i in range(count):
+        id64 = 1000000 + i
+        name = f"LOAD TEST {i:05}"
+        systems.append((id64, name))
+        starType = "" if i % 10 == 0 else "K (Yellow-Orange) Star"
+        expected[id64] = starType
+        if starType: rows.append((name, id64, starType))
+    server.addSystems(rows)
+    return systems, expected
+
+def runScenario(load, network, scenario):
+    server = StandInServer().start()
+    #the client keeps one rate limiter per host, every server gets a new port
+    load.EDSM_API = server.url
+    network.BACKOFF_BASE, network.BACKOFF_CAP = scenario.backoff
+    load.client.timeout = scenario.timeout
+    systems, expected = makeRoute(server, scenario.systems)
+    if scenario.setup: scenario.setup(server)
+    app = load.app = WorkerApp()
+    bytesBefore = load.metrics.get("edsm.bytes")
+    stopWorker = Event()
+    thread = Thread(target=load.EDSMworker, args=(1, systems, stopWorker), name="EDSM worker")
+    thread.daemon = True
+    startTime = time.perf_counter()
+    thread.start()
+    stopTime = None
+    if scenario.stopAfter is not None:
+        thread.join(scenario.stopAfter)
+        stopTime = time.perf_counter()
+        stopWorker.set()
+        thread.join(CANCEL_GRACE)
+    else:
+        thread.join(300)
+    endTime = time.perf_counter()
+    server.stop()
+
+    failures = []
+    if thread.is_alive(): failures.append("worker still running")
+    results = app.getResults()
+    requests = server.requests.get("/api-v1/systems", 0)
+    if scenario.expect == "complete":
+        wrong = [id64 for id64, starType in expected.items() if starType and results.get(id64) != starType]
+        if wrong: failures.append(f"{len(wrong)} systems without star type")
+        missing = [id64 for id64 in expected if id64 not in app.cache]
+        if missing: failures.append(f"{len(missing)} systems not cached")
+        negative = [id64 for id64, starType in expected.items() if not starType and app.cache.get(id64) != ""]
+        if negative: failures.append(f"{len(negative)} unknown systems not cached as negative")
+    elif scenario.expect == "cancelled":
+        if endTime - stopTime > CANCEL_GRACE: failures.append(f"stopped after {endTime-stopTime:.2f}s")
+        late = [patchTime for patchTime, _, _ in app.patches if patchTime > stopTime + 0.05]
+        if late: failures.append(f"{len(late)} patches after cancellation")
+    elif scenario.expect == "giveUp":
+        if results: failures.append("results after giving up")
+        if requests != load.MAX_RETRIES + 1: failures.append(f"{requests} requests, expected {load.MAX_RETRIES+1}")
+    if scenario.maxRequests is not None and requests > scenario.maxRequests:
+        failures.append(f"{requests} requests, expected at most {scenario.maxRequests}")
+
+    duration = endTime - startTime
+    return {
+        "name": scenario.name,
+        "ok": not failures,
+        "duration": duration,
+        "requests": requests,
+        "rate": len(results)/duration if duration > 0 else 0,
+        "bytes": load.metrics.get("edsm.bytes") - bytesBefore,
+        "faults": dict(server.faults),
+        "failures": failures,
+    }
+
+def getScenarios(count):
+    chunks = math.ceil(count/50)
+    def latency(seconds):
+        def setup(server): server.latency = seconds
+        return setup
+    def rateLimit(server):
+        server.rateLimit = 10
+        server.rateWindow = 2
+    def burst(server): server.throttle(3)
+    def bareBurst(server):
+        server.throttleHeaders = False
+        server.throttle(3)
+    def alwaysThrottled(server):
+        server.throttleHeaders = False
+        server.throttle(1000000)
+    def padding(server): server.rowPadding = 2000
+    def drop(server): server.dropEvery = 4
+    def errors(server): server.errorEvery = 3
+    def stall(server):
+        server.stallEvery = 5
+        server.stall = 1.5
+    def alwaysFail(server): server.errorEvery = 1
+    return [
+        Scenario("throughput", count, maxRequests=chunks),
+        Scenario("latency 100ms", count, latency(0.1), maxRequests=chunks),
+        Scenario("large payload", count, padding, maxRequests=chunks),
+        #the limiter should pace the requests from the headers instead of running into 429s
+        Scenario("rate limit 10/2s", min(count, 50*25), rateLimit, maxRequests=math.ceil(min(count, 50*25)/50)+2),
+        Scenario("429 burst", count, burst, maxRequests=chunks+3),
+        #429s without X-Rate-Limit headers are retried with backoff and count as attempts
+        Scenario("429 without headers", count, bareBurst, maxRequests=chunks+3),
+        Scenario("429 without headers, give up", count, alwaysThrottled, expect="giveUp"),
+        Scenario("dropped connections", count, drop),
+        Scenario("server errors", count, errors),
+        Scenario("read timeouts", count, stall, timeout=(2, 0.5)),
+        Scenario("give up", count, alwaysFail, expect="giveUp"),
+        Scenario("cancel while querying", count*4, latency(0.2), stopAfter=0.5, expect="cancelled"),
+        Scenario("cancel while backing off", count, alwaysFail, stopAfter=0.5, expect="cancelled", backoff=(30, 60)),
+        #a retry loop without delay would send hundreds of requests before the cancellation
+        Scenario("cancel while throttled", count, alwaysThrottled, stopAfter=0.5, expect="cancelled", maxRequests=2, backoff=(30, 60)),
+    ]
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Load tests for the EDSM worker.")
+    parser.add_argument("--systems", type=int, default=1000, help="route length of each scenario")
+    parser.add_argument("--only", default="", help="run the scenarios containing this name")
+    parser.add_argument("--verbose", action="store_true", help="show the plugin log")
+    args = parser.parse_args(argv[1:])
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.CRITICAL)
+
+    pluginDir = tempfile.mkdtemp(prefix="nextstop-load-")
+    os.makedirs(path.join(pluginDir, "EDMC-NextStop"))
+    #NextStop needs a Tk root for its settings
+    root = tk.Tk()
+    root.withdraw()
+    #the plugin starts the DCoH worker on import, keep it off the real APIs
+    server = StandInServer().start()
+    os.environ["NEXTSTOP_EDSM_API"] = server.url
+    os.environ["NEXTSTOP_DCOH_API"] = server.url
+    installFakeEDMC(pluginDir, "Simple")
+    import load
+    from nextstop import network
+    #the scenarios swap the plugin for WorkerApp
+    nextStop = load.app
+
+    results = [runScenario(load, network, scenario) for scenario in getScenarios(args.systems) if args.only in scenario.name]
+    print(f"{'scenario':<32}{'result':>7}{'time':>9}{'req':>6}{'sys/s':>9}{'KB':>9}  faults")
+    for result in results:
+        print(f"{result['name']:<32}{'PASS' if result['ok'] else 'FAIL':>7}{result['duration']:>8.2f}s{result['requests']:>6}{result['rate']:>9.0f}{result['bytes']/1024:>9.0f}  {result['faults'] or ''}")
+        for failure in result["failures"]:
+            print(f"    {failure}")
+    #there is no board to save the settings of, only close the client and the cache
+    load.app = nextStop
+    load.client.close()
+    nextStop.systemCache.close()
+    server.stop()
+    root.destroy()
+    return 0 if all(result["ok"] for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
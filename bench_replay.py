@@ -0,0 +1,261 @@
+"""
+Replay a recorded journal folder through the plugin without the game or the network.
+Journal.*.log files are fed to journal_entry in order, NavRoute events get the route from NavRoute.json
+(or from the event itself), and the EDSM and DCoH workers talk to a local stand-in server.
+Reports the handling time of every event type, worker run time, redraw time and event loop lag.
+
+Usage: python bench_replay.py <journal folder> [--speed N] [--mode Simple|Fancy] [--latency SEC]
+  --speed 0 replays as fast as possible, 1 in real time, 10 ten times faster
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import logging
+import tempfile
+import ctypes
+import threading
+import statistics
+from glob import glob
+from os import path
+from datetime import datetime
+from types import ModuleType, SimpleNamespace
+from unittest.mock import MagicMock
+import tkinter as tk
+
+from standin_server import StandInServer
+
+#event loop tick used to measure lag
+TICK_MS = 16
+#seconds between checks for running workers at the end
+POLL_MS = 100
+
+class FakeConfig:
+    #the parts of EDMC's config used by the plugin
+    def __init__(self, pluginDir, mode):
+        self.plugin_dir = pluginDir
+        self.values = {"nextStop_Mode": mode}
+
+    def get_str(self, key, default=""): return self.values.get(key, default)
+    def get_int(self, key, default=0): return self.values.get(key, default)
+    def set(self, key, value): self.values[key] = value
+
+def installFakeEDMC(pluginDir, mode):
+    #EDMC modules the plugin imports, set up before load is imported
+    config = ModuleType("config")
+    config.appname = "EDMarketConnector"
+    config.config = FakeConfig(pluginDir, mode)
+    sys.modules["config"] = config
+    theme = ModuleType("theme")
+    theme.theme = SimpleNamespace(current={"foreground": "black", "font": ("Helvetica", 9)}, update=lambda widget: None)
+    sys.modules["theme"] = theme
+    nb = MagicMock()
+    nb.Frame = tk.Frame
+    nb.Label = tk.Label
+    nb.Entry = tk.Entry
+    nb.OptionMenu = tk.OptionMenu
+    nb.Checkbutton = tk.Checkbutton
+    sys.modules["myNotebook"] = nb
+    #load.py registers the logo font through the Windows API
+    if not hasattr(ctypes, "windll"): ctypes.windll = MagicMock()
+
+def readJournal(folder):
+    entries = []
+    for journalPath in sorted(glob(path.join(folder, "Journal.*.log"))):
+        with open(journalPath, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
+
+def readNavRoute(folder):
+    navRoutePath = path.join(folder, "NavRoute.json")
+    if not path.exists(navRoutePath): return None
+    with open(navRoutePath, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def getTimestamp(entry):
+    try:
+        return datetime.fromisoformat(entry["timestamp"].replace("Z", "+00:00")).timestamp()
+    except (KeyError, ValueError):
+        return None
+
+class Recorder:
+    """
+    Duration samples by name, safe to use from worker threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, name, seconds):
+        with self.lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def timed(self, name, func):
+        def wrapper(*args, **kwargs):
+            startTime = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - startTime)
+        return wrapper
+
+    def getText(self):
+        lines = [f"{'name':<28}{'count':>7}{'mean':>10}{'p95':>10}{'max':>10}  (ms)"]
+        with self.lock:
+            items = sorted(self.samples.items())
+        for name, samples in items:
+            p95 = statistics.quantiles(samples, n=20)[-1] if len(samples) > 1 else samples[0]
+            lines.append(f"{name:<28}{len(samples):>7}{statistics.fmean(samples)*1000:>10.2f}{p95*1000:>10.2f}{max(samples)*1000:>10.2f}")
+        return "\n".join(lines)
+
+class Replayer:
+    """
+    Feeds journal entries to the plugin from the Tk event loop, so worker updates are drawn in between
+    like they are in EDMC.
+    """
+
+    def __init__(self, root, load, entries, navRoute, speed, recorder, timeout):
+        self.root = root
+        self.load = load
+        self.entries = entries
+        self.navRoute = navRoute
+        self.speed = speed
+        self.recorder = recorder
+        self.timeout = timeout
+        self.index = 0
+        #the state EDMC keeps from the journal
+        self.state = {"StarPos": [0, 0, 0], "SystemAddress": 0, "SystemName": "", "NavRoute": {"event": "", "Route": []}}
+        self.firstTimestamp = None
+        self.startTime = 0.0
+        self.endTime = 0.0
+        self.lastTick = 0.0
+
+    def start(self):
+        self.startTime = self.lastTick = time.perf_counter()
+        self.firstTimestamp = getTimestamp(self.entries[0])
+        self.root.after(TICK_MS, self.tick)
+        self.root.after(0, self.step)
+
+    def tick(self):
+        now = time.perf_counter()
+        self.recorder.add("loop.lag", max(now - self.lastTick - TICK_MS/1000, 0))
+        self.lastTick = now
+        self.root.after(TICK_MS, self.tick)
+
+    def updateState(self, entry):
+        event = entry.get("event", "")
+        if event in ("Location", "FSDJump", "CarrierJump"):
+            self.state["StarPos"] = entry.get("StarPos", self.state["StarPos"])
+            self.state["SystemAddress"] = entry.get("SystemAddress", 0)
+            self.state["SystemName"] = entry.get("StarSystem", "")
+        elif event == "NavRoute":
+            #newer journals only point at NavRoute.json
+            if entry.get("Route"):
+                self.state["NavRoute"] = entry
+            elif self.navRoute:
+                self.state["NavRoute"] = dict(self.navRoute, event="NavRoute")
+        elif event == "NavRouteClear":
+            self.state["NavRoute"] = {"event": "NavRouteClear", "Route": []}
+
+    def step(self):
+        if self.index >= len(self.entries):
+            self.endTime = time.perf_counter()
+            self.waitForWorkers(time.perf_counter())
+            return
+        entry = self.entries[self.index]
+        self.index += 1
+        self.updateState(entry)
+        event = entry.get("event", "")
+        startTime = time.perf_counter()
+        try:
+            self.load.journal_entry("BENCH", False, self.state["SystemName"], "", entry, self.state)
+        except Exception as e:
+            print(f"{event} failed! {type(e).__name__}{e}")
+        self.recorder.add(f"event.{event}", time.perf_counter() - startTime)
+        self.root.after(self.getDelay(), self.step)
+
+    def getDelay(self):
+        #milliseconds until the next entry is due
+        if self.speed <= 0 or self.index >= len(self.entries): return 0
+        timestamp = getTimestamp(self.entries[self.index])
+        if timestamp is None: return 0
+        if self.firstTimestamp is None: self.firstTimestamp = timestamp
+        due = self.startTime + (timestamp - self.firstTimestamp)/self.speed
+        return max(round((due - time.perf_counter())*1000), 0)
+
+    def waitForWorkers(self, waitStart):
+        running = [thread for thread in threading.enumerate() if thread.name == "EDSM worker"]
+        if running and time.perf_counter() - waitStart < self.timeout:
+            self.root.after(POLL_MS, self.waitForWorkers, waitStart)
+            return
+        if running: print(f"{len(running)} worker(s) still running after {self.timeout}s.")
+        self.root.quit()
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Replay a journal folder through NextStop.")
+    parser.add_argument("folder", help="folder with Journal.*.log and NavRoute.json")
+    parser.add_argument("--speed", type=float, default=0, help="0 = as fast as possible, 1 = real time")
+    parser.add_argument("--mode", choices=("Simple", "Fancy"), default="Fancy")
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in server latency in seconds")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for workers at the end")
+    parser.add_argument("--verbose", action="store_true", help="show the plugin log")
+    args = parser.parse_args(argv[1:])
+
+    entries = readJournal(args.folder)
+    if not entries:
+        print(f"No journal entries in {args.folder}")
+        return 1
+    navRoute = readNavRoute(args.folder)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    server = StandInServer(latency=args.latency)
+    if navRoute: server.addRoute(navRoute.get("Route", []))
+    for entry in entries:
+        if entry.get("event") == "NavRoute": server.addRoute(entry.get("Route", []))
+    server.start()
+    os.environ["NEXTSTOP_EDSM_API"] = server.url
+    os.environ["NEXTSTOP_DCOH_API"] = server.url
+
+    pluginDir = tempfile.mkdtemp(prefix="nextstop-bench-")
+    os.makedirs(path.join(pluginDir, "EDMC-NextStop"))
+    root = tk.Tk()
+    root.title("NextStop Replay")
+    root.geometry("300x600")
+    installFakeEDMC(pluginDir, args.mode)
+    import load
+
+    recorder = Recorder()
+    #the worker thread looks EDSMworker up when it starts
+    load.EDSMworker = recorder.timed("worker.EDSM", load.EDSMworker)
+    load.plugin_start3(pluginDir)
+    frame = load.plugin_app(root)
+    frame.grid(row=0, column=0, sticky=tk.NSEW)
+    root.rowconfigure(0, weight=1)
+    root.columnconfigure(0, weight=1)
+    app = load.app
+    app.onEDSMUpdate = recorder.timed("frame.EDSMUpdate", app.onEDSMUpdate)
+    app.ui.updateCanvas = recorder.timed("frame.updateCanvas", app.ui.updateCanvas)
+
+    replayer = Replayer(root, load, entries, navRoute, args.speed, recorder, args.timeout)
+    replayer.start()
+    root.mainloop()
+
+    duration = replayer.endTime - replayer.startTime
+    print(f"Replayed {len(entries)} entries in {duration:.2f}s (speed {args.speed or 'max'})")
+    print(recorder.getText())
+    print(f"Stand-in requests: {server.requests}")
+    print(load.metrics.getText())
+    load.plugin_stop()
+    server.stop()
+    root.destroy()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -6,12 +6,10 @@ It shows information about every star system in your route.
 import logging
 import tkinter as tk
 from typing import Optional
-from threading import Thread, RLock, Event
-import time
+from threading import Thread, Event
+from queue import Queue, Empty
 import requests
-import copy
-import json
-from os import path
+from os import path, environ
 
 import ctypes
 from ctypes.wintypes import DWORD, LPCVOID, LPCWSTR
@@ -21,6 +19,11 @@ FR_PRIVATE = 0x10
 AddFontResourceEx(path.join(path.dirname(__file__), 'nextstop/assets/nextstop-logo.ttf'), FR_PRIVATE, 0)
 
 from nextstop.ui.boards import SimpleBoard, FancyBoard
+from nextstop.cache import SystemCache, DAY
+from nextstop.metrics import metrics
+from nextstop.lookup import LookupQueue
+from nextstop.route import Route, RouteSystem
+from nextstop.network import client, getBackoff, MAX_RETRIES
 
 import myNotebook as nb  # noqa: N813
 from config import appname, config
@@ -28,7 +31,15 @@ from config import appname, config
 # This **MUST** match the name of the folder the plugin is in.
 PLUGIN_NAME = "EDMC-NextStop"
 
-CACHE_LIMIT = 2000
+CACHE_LIMIT = 200000
+#max number of systems in one EDSM request
+EDSM_CHUNK_SIZE = 50
+#days before a cached star type (positive) or a system unknown to EDSM (negative) is looked up again
+POSITIVE_TTL_DAYS = 365
+NEGATIVE_TTL_DAYS = 7
+#API hosts, can point at a local stand-in server for benchmarks
+EDSM_API = environ.get("NEXTSTOP_EDSM_API", "https://www.edsm.net")
+DCOH_API = environ.get("NEXTSTOP_DCOH_API", "https://dcoh.watch")
 
 logger = logging.getLogger(f"{appname}.{PLUGIN_NAME}")
 
@@ -45,56 +56,70 @@ class NextStop:
         #config variable
         self.mode = tk.StringVar(value=config.get_str('nextStop_Mode'))
         self.debugMode = tk.IntVar(value=config.get_int('nextStop_DebugMode'))
+        self.positiveTTL = tk.IntVar(value=config.get_int('nextStop_PositiveTTL', default=POSITIVE_TTL_DAYS))
+        self.negativeTTL = tk.IntVar(value=config.get_int('nextStop_NegativeTTL', default=NEGATIVE_TTL_DAYS))
+        #seconds between metrics log lines, 0 = off
+        self.metricsLogInterval = tk.IntVar(value=config.get_int('nextStop_MetricsLogInterval'))
         #init module
         self.ui = None
         self.frame = None
+        self.metricsLogID = ""
+        #star type lookups of the running EDSM worker
+        self.lookupQueue = None
+        self.lookupFocus = (0, (0, -1))
         logger.debug(f"Config: nextStop_Mode = {self.mode.get()}, nextStop_DebugMode = {self.debugMode.get()}")
         #get info from DCoH using thread
         thread = Thread(target=DCoHWorker, name='DCoH worker')
         thread.daemon = True
         thread.start()
-        #thread lock for cache
-        self.cacheLock = RLock()
-        #kill switch for worker
+        #kill switch for the running EDSM worker, replaced for every run
         self.stopWorker = Event()
+        #star type patches from EDSM workers, (route version, patch)
+        self.patches = Queue()
         #cache
         pluginDir = path.join(config.plugin_dir, PLUGIN_NAME)
-        self.cachePath = path.join(pluginDir, "system_cache.json")
-        self.systemCache = {}
-        self.loadCache()
+        self.cachePath = path.join(pluginDir, "system_cache.db")
+        #entries are read on demand, the old JSON cache is imported once
+        self.systemCache = SystemCache(self.cachePath, CACHE_LIMIT, path.join(pluginDir, "system_cache.json"))
+        self.updateCacheTTL()
+        #changes are written to disk by a background thread
+        self.systemCache.start()
         logger.info("NextStop instantiated")
 
-    def getFromCache(self, id64):
-        with self.cacheLock:
-            starType = self.systemCache.get(str(id64), "")
-            if starType:
-                self.updateCache(id64, starType)
-            return starType
-
-    def updateCache(self, id64, starType):
-        with self.cacheLock:
-            key = str(id64)
-            self.systemCache.pop(key, "")
-            self.systemCache[key] = starType
-            if len(self.systemCache) > 0 and len(self.systemCache) > CACHE_LIMIT:
-                firstKey = next(iter(self.systemCache))
-                del self.systemCache[firstKey]
-
-    def loadCache(self):
+    def updateCacheTTL(self):
         try:
-            if path.exists(self.cachePath):
-                with open(self.cachePath, "r") as file:
-                    self.systemCache = json.load(file)
-        except Exception as e:
-            logger.error(f"Failed to load system cache! {e}")
-
-    def saveCache(self):
-        try:
-            with self.cacheLock:
-                with open(self.cachePath, "w") as file:
-                    json.dump(self.systemCache, file)
-        except Exception as e:
-            logger.error(f"Failed to save system cache! {e}")
+            positiveTTL = max(self.positiveTTL.get(), 0)
+            negativeTTL = max(self.negativeTTL.get(), 0)
+        except tk.TclError:
+            logger.error("Invalid cache TTL! Using default values.")
+            positiveTTL = POSITIVE_TTL_DAYS
+            negativeTTL = NEGATIVE_TTL_DAYS
+        self.positiveTTL.set(positiveTTL)
+        self.negativeTTL.set(negativeTTL)
+        self.systemCache.setTTL(positiveTTL*DAY, negativeTTL*DAY)
+
+    def getManyFromCache(self, ids):
+        return self.systemCache.getMany(ids)
+
+    def updateManyCache(self, items):
+        self.systemCache.putMany(items)
+
+    def cancelMetricsLog(self):
+        if self.metricsLogID:
+            self.frame.after_cancel(self.metricsLogID)
+            self.metricsLogID = ""
+
+    def scheduleMetricsLog(self):
+        #restart the timer with the current interval
+        self.cancelMetricsLog()
+        interval = self.metricsLogInterval.get()
+        if interval > 0 and self.frame:
+            self.metricsLogID = self.frame.after(interval*1000, self.logMetrics)
+
+    def logMetrics(self):
+        self.metricsLogID = ""
+        logger.info("Metrics:\n"+metrics.getText())
+        self.scheduleMetricsLog()
 
     def getRoute(self):
         if not self.ui:
@@ -126,11 +151,11 @@ class NextStop:
         else:
             return self.ui.getCurrentPos()
 
-    def setCurrentPos(self, currentPos):
+    def setCurrentPos(self, currentPos, id64=0):
         if not self.ui:
             logger.error("Failed to setCurrentPos! UI module is None.")
         else:
-            self.ui.setCurrentPos(currentPos)
+            self.ui.setCurrentPos(currentPos, id64)
 
     def on_load(self) -> str:
         """
@@ -147,7 +172,14 @@ class NextStop:
         """
         self.stopWorker.set() #stop all EDSM worker
         self.on_preferences_closed("", False)  # Save our prefs
-        self.saveCache()
+        #saving the prefs restarts the metrics timer, nothing should fire after shutdown
+        self.cancelMetricsLog()
+        client.close()
+        try:
+            #waits for the last write up to FLUSH_DEADLINE
+            self.systemCache.close()
+        except Exception as e:
+            logger.error(f"Failed to close system cache! {e}")
 
     def setup_preferences(self, parent: nb.Notebook, cmdr: str, is_beta: bool) -> Optional[tk.Frame]:
         """
@@ -168,6 +200,17 @@ class NextStop:
         current_row += 1  # Always increment our row counter, makes for far easier tkinter design.
         nb.Label(frame, text='Debug: ').grid(row=current_row, column=0, sticky=tk.W)
         nb.Checkbutton(frame, text='Show Performance Metrics', variable=self.debugMode).grid(row=current_row, column=1, sticky=tk.W)
+        current_row += 1
+        nb.Label(frame, text='Log metrics every (sec, 0 = off): ').grid(row=current_row, column=0, sticky=tk.W)
+        nb.Entry(frame, textvariable=self.metricsLogInterval, width=6).grid(row=current_row, column=1, sticky=tk.W)
+        current_row += 1
+        nb.Label(frame, text='Cache expiry (days, 0 = never): ').grid(row=current_row, column=0, sticky=tk.W)
+        current_row += 1
+        nb.Label(frame, text='Known systems: ').grid(row=current_row, column=0, sticky=tk.W)
+        nb.Entry(frame, textvariable=self.positiveTTL, width=6).grid(row=current_row, column=1, sticky=tk.W)
+        current_row += 1
+        nb.Label(frame, text='Unknown systems: ').grid(row=current_row, column=0, sticky=tk.W)
+        nb.Entry(frame, textvariable=self.negativeTTL, width=6).grid(row=current_row, column=1, sticky=tk.W)
         return frame
 
     def on_preferences_closed(self, cmdr: str, is_beta: bool) -> None:
@@ -178,6 +221,17 @@ class NextStop:
         :param is_beta: Whether or not EDMC is currently marked as in beta mode
         """
         config.set('nextStop_DebugMode', self.debugMode.get())
+        self.updateCacheTTL()
+        config.set('nextStop_PositiveTTL', self.positiveTTL.get())
+        config.set('nextStop_NegativeTTL', self.negativeTTL.get())
+        try:
+            interval = max(self.metricsLogInterval.get(), 0)
+        except tk.TclError:
+            logger.error("Invalid metrics log interval! Logging disabled.")
+            interval = 0
+        self.metricsLogInterval.set(interval)
+        config.set('nextStop_MetricsLogInterval', interval)
+        self.scheduleMetricsLog()
         self.ui.updateDebugObject()
         mode = self.mode.get()
         config.set('nextStop_Mode', mode)
@@ -186,13 +240,14 @@ class NextStop:
             #get route, current pos and thargoid systems from old board
             route = self.getRoute()
             currentPos = self.getCurrentPos()
+            currentID64 = self.ui.getCurrentID64()
             thargoidSystems = self.getThargoidSystems()
             #destory old board
             self.ui.destroy()
             #make a new board
             self.createBoard()
             self.setRoute(route)
-            self.setCurrentPos(currentPos)
+            self.setCurrentPos(currentPos, currentID64)
             self.setThargoidSystems(thargoidSystems)
             self.ui.updateCanvas()
         self.ui.updateTheme()
@@ -209,11 +264,40 @@ class NextStop:
         self.frame = frame = tk.Frame(parent)
         frame.grid_propagate(False)
         #bing a custom event to canvas for updateCanvas
-        frame.bind('<<EDSMUpdate>>', lambda event : self.ui.updateCanvas())
+        frame.bind('<<EDSMUpdate>>', lambda event : self.onEDSMUpdate())
         self.createBoard()
         self.ui.updateCanvas()
+        self.scheduleMetricsLog()
         return frame
 
+    def pushPatch(self, version, patch):
+        #called by workers, the patch is applied on the main thread
+        self.patches.put((version, patch))
+        self.frame.event_generate('<<EDSMUpdate>>', when="tail")
+
+    def applyPatches(self):
+        while True:
+            try:
+                version, patch = self.patches.get_nowait()
+            except Empty:
+                return
+            #results for an older route are dropped
+            if not self.ui.applyPatch(version, patch):
+                logger.debug(f"Dropped patch for route version {version}.")
+
+    def onEDSMUpdate(self):
+        self.applyPatches()
+        #a burst of worker updates is drawn in one frame, without scrolling away from what the commander is looking at
+        self.ui.requestFrame("data")
+        #rows may be scrolled since the last chunk
+        self.updateLookupFocus()
+
+    def updateLookupFocus(self):
+        #tell the running worker what the commander is looking at
+        self.lookupFocus = (self.ui.currentIndex, self.ui.getVisibleRange())
+        lookupQueue = self.lookupQueue
+        if lookupQueue: lookupQueue.setFocus(*self.lookupFocus)
+
     def createBoard(self):
         if self.mode.get() == self.SIMPLEMODE:
             logger.info("Display in simple mode.")
@@ -225,38 +309,36 @@ class NextStop:
     def onEvent(self, cmdr: str, is_beta: bool, system: str, station: str, entry: dict, state: dict) -> Optional[str]:
         if entry["event"] == "StartUp" and state["NavRoute"]["event"] == "NavRoute" or entry["event"] == "NavRoute":
             logger.info("Route detected! Updating UI.")
-            #clear route list
-            route = []
-            #loop through the route
-            for dest in state["NavRoute"]["Route"]:
-                temp = {}
-                temp["system"] = dest["StarSystem"]
-                temp["id64"] = dest["SystemAddress"]
-                temp["pos"] = dest["StarPos"]
-                #need EDSM to check
-                temp["starTypeName"] = ""
-                temp["edsmUrl"] = ""
-                temp["starClass"] = dest["StarClass"]
-                route.append(temp)
-            logger.debug("Route: "+str(route))
+            #loop through the route, star type and EDSM url are added by the worker
+            route = Route(RouteSystem(dest["StarSystem"], dest["SystemAddress"], tuple(dest["StarPos"]), dest["StarClass"]) for dest in state["NavRoute"]["Route"])
+            logger.debug("Route: "+str(route.systems))
+            #systems shared with the old route keep their star type, their rows only redraw if they moved
+            known = route.carryOver(self.getRoute())
+            logger.debug(f"{len(known)} systems reused from the previous route.")
             self.setRoute(route)
-            self.setCurrentPos(state["StarPos"])
+            self.setCurrentPos(state["StarPos"], state.get("SystemAddress") or 0)
             self.ui.currentIndex = 0
             self.ui.updateCanvas()
-            #stop all EDSM worker
+            self.updateLookupFocus()
+            #stop the old EDSM worker, each run has its own token so it can't miss the signal
             self.stopWorker.set()
-            self.stopWorker.clear()
-            #get info from EDSM using thread
-            logger.info('Starting worker thread.')
-            thread = Thread(target=EDSMworker, name='EDSM worker')
-            thread.daemon = True
-            thread.start()
+            self.stopWorker = stopWorker = Event()
+            if len(known) >= len(route.indexById):
+                logger.info("Every system is known, no worker needed.")
+            else:
+                #get info from EDSM using thread, the worker only gets a snapshot of the names
+                logger.info('Starting worker thread.')
+                systems = [(system.id64, system.system) for system in route]
+                thread = Thread(target=EDSMworker, args=(route.version, systems, stopWorker, known), name='EDSM worker')
+                thread.daemon = True
+                thread.start()
             logger.debug('NavRoute event handled.')
         elif entry["event"] == "NavRouteClear":
             logger.info("Route clear! Updating UI.")
             if not self.ui.jumping:
                 #clear route list
-                self.setRoute([])
+                self.stopWorker.set()
+                self.setRoute(Route())
                 self.ui.updateCanvas()
         elif entry["event"] == "StartJump" and entry["JumpType"] == "Hyperspace":
             logger.info("Jumping to another system.")
@@ -265,85 +347,142 @@ class NextStop:
             logger.info("Arrived at another system. Updating current position.")
             self.ui.jumping = False
             #update current pos
-            self.setCurrentPos(entry["StarPos"])
+            #SystemAddress finds the route index without comparing positions
+            self.setCurrentPos(entry["StarPos"], entry.get("SystemAddress", 0))
             self.ui.updateCanvas()
+            #re-rank the pending lookups around the new position
+            self.updateLookupFocus()
 
-def EDSMworker() -> None:
+def EDSMworker(version, systems, stopWorker, known=frozenset()) -> None:
+    """
+    :param version: Route version the results are for
+    :param systems: List of (id64, system name) of the route
+    :param stopWorker: Cancellation token of this run
+    :param known: id64 of systems which already have a star type
+    """
     try:
         logger.debug("Worker starting.")
-        url = "https://www.edsm.net/api-v1/systems"
-        logger.debug("URL: "+url)
-        param = {"showId":1, "showPrimaryStar":1, "systemName":[]}
-        appRoute = app.getRoute()
         #if no route
-        if len(appRoute) <= 0:
+        if len(systems) <= 0:
             logger.info("No route! Worker end!")
             return
-        #copy the route list
-        route = copy.deepcopy(appRoute)
-        #list of the route using SystemName as key and index as value
-        routeIndexs = {}
-        queryCount = 0
-        for i in range(len(route)):
-            if app.stopWorker.is_set(): return
-            id64 = route[i]["id64"]
-            starType = app.getFromCache(id64)
-            if not starType:
-                systemName = route[i]["system"]
-                param["systemName"].append(systemName)
-                routeIndexs[systemName] = i
-                queryCount+=1
-            else:
-                route[i]["starTypeName"] = starType
-                route[i]["edsmUrl"] = f"https://www.edsm.net/en/system?systemID64={id64}"
-        logger.debug(f"{len(route)-queryCount} cached, query {queryCount}")
-        while queryCount > 0:
-            if app.stopWorker.is_set(): return
-            logger.debug("Param: "+str(param))
-            #get info using the url above
-            req = requests.post(url, json=param, timeout=(5, 30))
-            limitReset = int(req.headers.get('X-Rate-Limit-Reset', "") or -1)
-            match req.status_code:
-                case requests.codes.ok:
-                    data = req.json()
-                    logger.debug("Data: "+str(data))
-                    for row in data:
-                        if app.stopWorker.is_set(): return
-                        systemName = row.get("name", "")
-                        routeIndex = routeIndexs.get(systemName, -1)
-                        if routeIndex < 0:
-                            continue
-                        id64 = route[routeIndex]["id64"]
-                        if id64 == row.get("id64", 0):
-                            starType = row.get("primaryStar", {}).get("type", "")
-                            route[routeIndex]["starTypeName"] = starType
-                            route[routeIndex]["edsmUrl"] = f"https://www.edsm.net/en/system?systemID64={id64}"
-                            app.updateCache(id64, starType)
-                    break
-                case 429:
-                    logger.error(f"Too Many Requests! Try again in {limitReset} sec!")
-                    if limitReset > 0:
-                        waitSec = limitReset - int(time.time()) if limitReset > 1000000000 else limitReset
-                        if app.stopWorker.wait(timeout=waitSec): return
-                        continue
-                    else:
-                        logger.error("Invalid X-Rate-Limit-Reset value!")
-            logger.error("Request not ok! Code: "+str(req.status_code))
-            return
-        logger.debug("Route after update: "+str(route))
-        app.setRoute(route)
-        app.frame.event_generate('<<EDSMUpdate>>', when="tail")
-        app.saveCache()
+        #route indexs of the systems need to query
+        queryIndexs = []
+        #id64: (starTypeName, edsmUrl)
+        patch = {}
+        #resolve the whole route against the cache in one pass
+        cached = app.getManyFromCache(id64 for id64, _ in systems if id64 not in known)
+        if stopWorker.is_set(): return
+        for i, (id64, _) in enumerate(systems):
+            if id64 in known: continue
+            starType = cached.get(id64)
+            #not cached or expired
+            if starType is None:
+                queryIndexs.append(i)
+            #skip systems EDSM doesn't know until the negative entry expires
+            elif starType:
+                patch[id64] = (starType, f"https://www.edsm.net/en/system?systemID64={id64}")
+        logger.debug(f"{len(systems)-len(queryIndexs)} known or cached, query {len(queryIndexs)}")
+        #show cached systems before the first request
+        if patch: app.pushPatch(version, patch)
+        #query the systems closest to the current jump first and show every chunk as soon as it arrives
+        lookupQueue = LookupQueue(queryIndexs, *app.lookupFocus)
+        app.lookupQueue = lookupQueue
+        #the focus may have changed before the queue was published
+        lookupQueue.setFocus(*app.lookupFocus)
+        try:
+            while len(lookupQueue) > 0:
+                patch = queryEDSM(systems, lookupQueue.pop(EDSM_CHUNK_SIZE), stopWorker)
+                if patch is None: return
+                if stopWorker.is_set(): return
+                app.pushPatch(version, patch)
+        finally:
+            if app.lookupQueue is lookupQueue: app.lookupQueue = None
+        logger.debug("Worker finished.")
     except Exception as e:
         logger.error(f"{type(e).__name__}{e}")
 
+def queryEDSM(systems, queryIndexs, stopWorker) -> Optional[dict]:
+    """
+    Query one chunk of systems.
+    :return: Patch of id64: (starTypeName, edsmUrl) or None if the worker should stop
+    """
+    url = f"{EDSM_API}/api-v1/systems"
+    #list of the chunk using SystemName as key and route index as value
+    routeIndexs = {systems[i][1]: i for i in queryIndexs}
+    param = {"showId":1, "showPrimaryStar":1, "systemName":list(routeIndexs)}
+    #shared by every worker run, paced by the rate limit headers of each response
+    limiter = client.getLimiter(url)
+    attempt = 0
+    while True:
+        if stopWorker.is_set(): return None
+        if not limiter.acquire(stopWorker): return None
+        logger.debug("Param: "+str(param))
+        #get info using the url above
+        try:
+            req = client.post(url, json=param, metricName="edsm")
+        except (requests.Timeout, requests.ConnectionError) as e:
+            if not backoff(attempt, f"{type(e).__name__}{e}", stopWorker): return None
+            attempt += 1
+            continue
+        match req.status_code:
+            case requests.codes.ok:
+                data = req.json()
+                logger.debug("Data: "+str(data))
+                #id64: star type of every queried system
+                results = {}
+                patch = {}
+                for row in data:
+                    if stopWorker.is_set(): return None
+                    systemName = row.get("name", "")
+                    routeIndex = routeIndexs.get(systemName, -1)
+                    if routeIndex < 0:
+                        continue
+                    id64 = systems[routeIndex][0]
+                    if id64 == row.get("id64", 0):
+                        starType = (row.get("primaryStar") or {}).get("type", "")
+                        patch[id64] = (starType, f"https://www.edsm.net/en/system?systemID64={id64}")
+                        results[id64] = starType
+                #cache systems missing from the response as negative entries
+                for routeIndex in routeIndexs.values():
+                    results.setdefault(systems[routeIndex][0], "")
+                app.updateManyCache(results)
+                return patch
+            case 429:
+                if limiter.hasReset():
+                    #the limiter waits until the server refills
+                    logger.error(f"Too Many Requests! Try again in {req.headers.get('X-Rate-Limit-Reset', '?')} sec!")
+                    continue
+                #no reset time to wait for, retry like a server error
+                if not backoff(attempt, "Too Many Requests!", stopWorker): return None
+                attempt += 1
+                continue
+            case code if code >= 500:
+                if not backoff(attempt, f"Server error! Code: {code}", stopWorker): return None
+                attempt += 1
+                continue
+        logger.error("Request not ok! Code: "+str(req.status_code))
+        return None
+
+def backoff(attempt, reason, stopWorker) -> bool:
+    """
+    Wait before retrying a failed request.
+    :return: False if the worker should stop
+    """
+    if attempt >= MAX_RETRIES:
+        logger.error(f"{reason} Giving up after {attempt} retries!")
+        return False
+    waitSec = getBackoff(attempt)
+    logger.warning(f"{reason} Retry in {waitSec:.1f} sec.")
+    return not stopWorker.wait(timeout=waitSec)
+
 def DCoHWorker() -> None:
     try:
         logger.debug("DCoHWorker starting.")
-        url = "https://dcoh.watch/api/v1/overwatch/systems"
+        url = f"{DCOH_API}/api/v1/overwatch/systems"
         logger.debug("URL: "+url)
         #get info using the url above
-        req = requests.get(url)
+        req = client.get(url, metricName="dcoh")
         if not req.status_code == requests.codes.ok:
             logger.error("Request not ok! Code: "+str(req.status_code))
         data = req.json()
@@ -0,0 +1,287 @@
+import sqlite3
+import json
+import os
+from os import path
+from threading import Thread, RLock, Event
+import time
+
+from nextstop.metrics import metrics
+
+try:
+    from config import appname
+except ImportError:
+    #running outside EDMC, e.g. the dump importer
+    appname = "EDMarketConnector"
+import logging
+logger = logging.getLogger(f"{appname}.EDMC-NextStop")
+
+#entry kinds, a negative entry means EDSM has no star type for the system
+POSITIVE = 1
+NEGATIVE = 0
+
+DAY = 24*60*60
+#max number of ids in one SELECT, older SQLite only allows 999 variables
+READ_CHUNK = 500
+#seconds to wait for more updates before writing
+FLUSH_DELAY = 2
+#seconds the final write may hold the shutdown
+FLUSH_DEADLINE = 1.5
+
+class SystemCache:
+    """
+    Persistent id64 -> primary star type cache backed by SQLite.
+    Entries are read from disk on demand and only new or changed entries are written back,
+    so opening and saving the cache do not depend on how many systems it holds.
+    Positive and negative entries expire separately, a TTL of 0 never expires.
+    Changes are written behind by a flusher thread after start() is called.
+    """
+
+    def __init__(self, dbPath, limit, legacyPath="", positiveTTL=365*DAY, negativeTTL=7*DAY):
+        self.dbPath = dbPath
+        self.limit = limit
+        self.positiveTTL = positiveTTL
+        self.negativeTTL = negativeTTL
+        self.lock = RLock()
+        #entries read from disk or added since start, id64: (starType, updated)
+        self.entries = {}
+        #LRU clock value of each entry in memory, id64: tick
+        self.ticks = {}
+        #entries which need to be written to disk
+        self.dirty = set()
+        self.tick = 0
+        self.count = 0
+        self.db = None
+        #write-behind flusher
+        self.flusher = None
+        self.dirtyEvent = Event()
+        self.closing = Event()
+        self.open()
+        if legacyPath: self.importLegacy(legacyPath)
+
+    def open(self):
+        try:
+            db = self.connect()
+            with db:
+                db.execute("CREATE TABLE IF NOT EXISTS systems (id64 INTEGER PRIMARY KEY, starType TEXT NOT NULL, lastUsed INTEGER NOT NULL, kind INTEGER NOT NULL, updated INTEGER NOT NULL)")
+                db.execute("CREATE INDEX IF NOT EXISTS systemsLastUsed ON systems (lastUsed)")
+                db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+                #systems from EDSM dumps, not limited by the LRU
+                db.execute("CREATE TABLE IF NOT EXISTS imported (id64 INTEGER PRIMARY KEY, starType TEXT NOT NULL)")
+            self.db = db
+            self.tick = db.execute("SELECT COALESCE(MAX(lastUsed), 0) FROM systems").fetchone()[0]
+            row = db.execute("SELECT value FROM meta WHERE key = 'count'").fetchone()
+            #count the rows once if no count was saved yet
+            self.count = row[0] if row else db.execute("SELECT COUNT(*) FROM systems").fetchone()[0]
+            self.updateSizeMetrics()
+        except Exception as e:
+            logger.error(f"Failed to open system cache! {e}")
+            self.db = None
+
+    def connect(self):
+        db = sqlite3.connect(self.dbPath, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def setTTL(self, positiveTTL, negativeTTL):
+        with self.lock:
+            self.positiveTTL = positiveTTL
+            self.negativeTTL = negativeTTL
+
+    def isExpired(self, entry):
+        starType, updated = entry
+        ttl = self.positiveTTL if starType else self.negativeTTL
+        return ttl > 0 and time.time() - updated > ttl
+
+    def importLegacy(self, legacyPath):
+        #move the old whole-file JSON cache into the database
+        if not self.db or not path.exists(legacyPath): return
+        try:
+            with open(legacyPath, "r") as file:
+                data = json.load(file)
+            with self.lock:
+                #the JSON file is in LRU order, oldest first
+                for key, starType in data.items():
+                    self.put(key, starType)
+                self.save()
+            os.replace(legacyPath, legacyPath+".migrated")
+            logger.info(f"Imported {len(data)} systems from legacy cache.")
+        except Exception as e:
+            logger.error(f"Failed to import legacy system cache! {e}")
+
+    def touch(self, id64):
+        self.tick += 1
+        self.ticks[id64] = self.tick
+        self.dirty.add(id64)
+        self.dirtyEvent.set()
+
+    def getMany(self, ids):
+        """
+        Look up many systems with one lock round trip.
+        :return: Dict of id64: star type for every fresh entry, "" for negative entries
+        """
+        with self.lock:
+            ids = [int(id64) for id64 in ids]
+            self.readEntries([id64 for id64 in ids if id64 not in self.entries])
+            result = {}
+            for id64 in ids:
+                entry = self.entries.get(id64)
+                if entry is None or self.isExpired(entry): continue
+                result[id64] = entry[0]
+            negativeHits = sum(1 for starType in result.values() if not starType)
+            metrics.incr("cache.hits", len(result)-negativeHits)
+            metrics.incr("cache.negativeHits", negativeHits)
+            metrics.incr("cache.misses", len(ids)-len(result))
+            #refresh LRU order in route order
+            for id64 in result:
+                self.tick += 1
+                self.ticks[id64] = self.tick
+            self.dirty.update(result)
+            if result: self.dirtyEvent.set()
+            return result
+
+    def readEntries(self, ids):
+        if not self.db or not ids: return
+        startTime = time.perf_counter()
+        for i in range(0, len(ids), READ_CHUNK):
+            chunk = ids[i:i+READ_CHUNK]
+            marks = ",".join("?"*len(chunk))
+            for id64, starType, updated in self.db.execute(f"SELECT id64, starType, updated FROM systems WHERE id64 IN ({marks})", chunk):
+                self.entries[id64] = (starType, updated)
+            #fall back to systems imported from an EDSM dump
+            chunk = [id64 for id64 in chunk if id64 not in self.entries]
+            if not chunk: continue
+            marks = ",".join("?"*len(chunk))
+            for id64, starType, updated in self.db.execute(f"SELECT id64, starType, (SELECT value FROM meta WHERE key = 'importedAt') FROM imported WHERE id64 IN ({marks})", chunk):
+                self.entries[id64] = (starType, updated or 0)
+        metrics.addTiming("cache.load", time.perf_counter() - startTime)
+
+    def importSystems(self, rows, importedAt):
+        """
+        Bulk load systems from an EDSM dump in one transaction.
+        :param rows: Pairs of id64, star type
+        :param importedAt: Unix time the dump was made, imported entries expire like positive entries
+        """
+        with self.lock:
+            if not self.db: return
+            with self.db:
+                self.db.executemany("INSERT OR REPLACE INTO imported (id64, starType) VALUES (?, ?)", rows)
+                self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('importedAt', ?)", (int(importedAt),))
+
+    def putMany(self, items):
+        """
+        :param items: Dict or pairs of id64: star type, "" is stored as a negative entry
+        """
+        if isinstance(items, dict): items = items.items()
+        now = int(time.time())
+        with self.lock:
+            for id64, starType in items:
+                id64 = int(id64)
+                self.entries[id64] = (starType, now)
+                self.tick += 1
+                self.ticks[id64] = self.tick
+                self.dirty.add(id64)
+            self.dirtyEvent.set()
+
+    def put(self, id64, starType):
+        #an empty star type is stored as a negative entry
+        with self.lock:
+            id64 = int(id64)
+            self.entries[id64] = (starType, int(time.time()))
+            self.touch(id64)
+
+    def save(self):
+        #write synchronously, the flusher thread does this in the background
+        with self.lock:
+            if self.db: self.flush(self.db)
+
+    def flush(self, db):
+        with self.lock:
+            if not self.dirty: return
+            rows = []
+            for id64 in self.dirty:
+                starType, updated = self.entries[id64]
+                rows.append((starType, POSITIVE if starType else NEGATIVE, updated, self.ticks[id64], id64))
+            self.dirty.clear()
+        #disk I/O happens without the lock unless called from save
+        startTime = time.perf_counter()
+        try:
+            with db:
+                #update existing rows first so the number of new rows is known without counting the table
+                db.executemany("UPDATE systems SET starType = ?, kind = ?, updated = ?, lastUsed = ? WHERE id64 = ?", rows)
+                cursor = db.executemany("INSERT OR IGNORE INTO systems (starType, kind, updated, lastUsed, id64) VALUES (?, ?, ?, ?, ?)", rows)
+                self.count += max(cursor.rowcount, 0)
+                evicted = self.evict(db)
+                db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('count', ?)", (self.count,))
+        except Exception:
+            #try again on the next flush
+            with self.lock: self.dirty.update(row[-1] for row in rows)
+            raise
+        metrics.addTiming("cache.save", time.perf_counter() - startTime)
+        self.updateSizeMetrics()
+        metrics.incr("cache.evictions", len(evicted))
+        with self.lock:
+            for id64 in evicted:
+                #keep entries which were used again while writing
+                if id64 in self.dirty: continue
+                self.entries.pop(id64, None)
+                self.ticks.pop(id64, None)
+
+    def updateSizeMetrics(self):
+        metrics.setValue("cache.entries", self.count)
+        size = 0
+        for suffix in ("", "-wal"):
+            if path.exists(self.dbPath+suffix): size += path.getsize(self.dbPath+suffix)
+        metrics.setValue("cache.bytes", size)
+
+    def evict(self, db):
+        #remove the least recently used entries over the limit
+        extra = self.count - self.limit
+        if extra <= 0: return []
+        rows = db.execute("SELECT id64 FROM systems ORDER BY lastUsed LIMIT ?", (extra,)).fetchall()
+        db.executemany("DELETE FROM systems WHERE id64 = ?", rows)
+        self.count -= len(rows)
+        return [id64 for (id64,) in rows]
+
+    def start(self):
+        if not self.db or self.flusher: return
+        self.flusher = Thread(target=self.flushLoop, name="NextStop cache flusher")
+        self.flusher.daemon = True
+        self.flusher.start()
+
+    def flushLoop(self):
+        try:
+            #the flusher writes with its own connection so readers are never blocked by it
+            db = self.connect()
+        except Exception as e:
+            logger.error(f"Failed to start cache flusher! {e}")
+            return
+        while True:
+            self.dirtyEvent.wait()
+            #coalesce bursts of updates into one write
+            self.closing.wait(FLUSH_DELAY)
+            self.dirtyEvent.clear()
+            try:
+                self.flush(db)
+            except Exception as e:
+                logger.error(f"Failed to save system cache! {e}")
+            #the last flush runs after closing is set
+            if self.closing.is_set(): break
+        db.close()
+
+    def close(self, timeout=FLUSH_DEADLINE):
+        """
+        Stop the flusher after its final write or when the timeout is reached.
+        """
+        self.closing.set()
+        self.dirtyEvent.set()
+        if self.flusher:
+            self.flusher.join(timeout)
+            if self.flusher.is_alive():
+                logger.warning("System cache flusher did not finish in time!")
+        else:
+            self.save()
+        with self.lock:
+            if not self.db: return
+            self.db.close()
+            self.db = None
@@ -0,0 +1,123 @@
+"""
+Import an EDSM nightly dump into the NextStop system cache.
+The dump is read line by line, so memory use stays flat for multi-GB files.
+
+Usage: python -m nextstop.importer systemsWithPrimaryStar.json.gz [system_cache.db] [--date YYYY-MM-DD]
+  --date is the day the dump was made, by default the newest row date of the dump
+"""
+
+import sys
+import gzip
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+from os import path
+
+from nextstop.cache import SystemCache
+
+#rows written per transaction
+BATCH_SIZE = 20000
+#seconds between progress lines
+REPORT_INTERVAL = 5
+DEFAULT_CACHE = path.join(path.dirname(path.dirname(path.abspath(__file__))), "system_cache.db")
+
+def openDump(dumpPath):
+    if dumpPath.endswith(".gz"):
+        return gzip.open(dumpPath, "rt", encoding="utf-8")
+    return open(dumpPath, "r", encoding="utf-8")
+
+def iterDump(file):
+    #EDSM dumps are a JSON array with one system per line
+    for line in file:
+        line = line.strip().rstrip(",")
+        if not line or line in ("[", "]"): continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+def getStarType(system):
+    #systemsWithCoordinates has no primary star, those rows are skipped
+    starType = (system.get("primaryStar") or {}).get("type", "")
+    id64 = system.get("id64")
+    return (id64, starType) if id64 and starType else None
+
+def parseDate(text):
+    """
+    :param text: EDSM date "YYYY-MM-DD HH:MM:SS" or "YYYY-MM-DD" in UTC
+    :return: Unix time or None if the text is not a date
+    """
+    for format in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, format).replace(tzinfo=timezone.utc).timestamp()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def importDump(dumpPath, cache: SystemCache, report=print, dumpDate=None):
+    """
+    :param dumpDate: Unix time the dump was made, None = the newest row date, the file time if no row has one
+    :return: Number of rows read and number of systems imported
+    """
+    startTime = lastReport = time.perf_counter()
+    read = imported = 0
+    batch = []
+    #the file time is usually the download time, only a fallback
+    fileTime = path.getmtime(dumpPath)
+    #EDSM dates sort as text, only the newest is parsed
+    newestDate = ""
+    def getImportedAt():
+        if dumpDate is not None: return dumpDate
+        rowDate = parseDate(newestDate)
+        return rowDate if rowDate is not None else fileTime
+    with openDump(dumpPath) as file:
+        for system in iterDump(file):
+            read += 1
+            row = getStarType(system)
+            if row:
+                batch.append(row)
+                date = system.get("date")
+                if isinstance(date, str) and date > newestDate: newestDate = date
+            if len(batch) >= BATCH_SIZE:
+                cache.importSystems(batch, getImportedAt())
+                imported += len(batch)
+                batch = []
+            now = time.perf_counter()
+            if now - lastReport >= REPORT_INTERVAL:
+                lastReport = now
+                report(f"{read} rows, {imported} imported, {read/(now-startTime):.0f} rows/s")
+    #the last write also stores the date of the whole dump
+    cache.importSystems(batch, getImportedAt())
+    imported += len(batch)
+    duration = time.perf_counter() - startTime
+    report(f"Done: {read} rows, {imported} imported in {duration:.1f}s ({read/duration if duration > 0 else 0:.0f} rows/s)")
+    return read, imported
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Import an EDSM nightly dump into the NextStop system cache.")
+    parser.add_argument("dump", help="systemsWithPrimaryStar.json(.gz)")
+    parser.add_argument("cache", nargs="?", default=DEFAULT_CACHE, help="system cache database")
+    parser.add_argument("--date", default=None, help="day the dump was made, YYYY-MM-DD")
+    args = parser.parse_args(argv[1:])
+    dumpPath = args.dump
+    dbPath = args.cache
+    dumpDate = None
+    if args.date is not None:
+        dumpDate = parseDate(args.date)
+        if dumpDate is None:
+            print(f"Invalid date {args.date}, expected YYYY-MM-DD")
+            return 1
+    #the limit only applies to the LRU table, imported systems are kept
+    cache = SystemCache(dbPath, sys.maxsize)
+    if not cache.db:
+        print(f"Failed to open {dbPath}")
+        return 1
+    try:
+        importDump(dumpPath, cache, dumpDate=dumpDate)
+    finally:
+        cache.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
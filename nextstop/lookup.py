@@ -0,0 +1,44 @@
+from threading import Lock
+import heapq
+
+class LookupQueue:
+    """
+    Route indexs waiting for a star type lookup, ordered by how soon the commander reaches them.
+    Visible rows come first, then systems ahead of the current jump by distance in jumps, then passed systems.
+    """
+
+    def __init__(self, indexs, currentIndex=0, visibleRange=(0, -1)):
+        self.lock = Lock()
+        self.pending = set(indexs)
+        self.heap = []
+        self.setFocus(currentIndex, visibleRange)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pending)
+
+    def priority(self, index):
+        first, last = self.visibleRange
+        ahead = index - self.currentIndex
+        return (0 if first <= index <= last else 1, 0 if ahead >= 0 else 1, abs(ahead), index)
+
+    def setFocus(self, currentIndex, visibleRange):
+        #re-rank everything still waiting
+        with self.lock:
+            self.currentIndex = max(currentIndex, 0)
+            self.visibleRange = visibleRange
+            self.heap = [self.priority(index) for index in self.pending]
+            heapq.heapify(self.heap)
+
+    def pop(self, count):
+        """
+        :return: Up to count route indexs with the highest priority
+        """
+        with self.lock:
+            indexs = []
+            while self.heap and len(indexs) < count:
+                index = heapq.heappop(self.heap)[-1]
+                if index in self.pending:
+                    self.pending.discard(index)
+                    indexs.append(index)
+            return indexs
@@ -0,0 +1,71 @@
+from threading import Lock
+from contextlib import contextmanager
+import time
+
+class Metrics:
+    """
+    Thread-safe counters and timings for the performance metrics overlay.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.counters = {}
+        #name: [count, total, last, max] in seconds
+        self.timings = {}
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def setValue(self, name, value):
+        with self.lock:
+            self.counters[name] = value
+
+    def get(self, name):
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def addTiming(self, name, seconds):
+        with self.lock:
+            timing = self.timings.setdefault(name, [0, 0.0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = seconds
+            timing[3] = max(timing[3], seconds)
+
+    def getTiming(self, name):
+        """
+        :return: Count, average, last and max duration in seconds
+        """
+        with self.lock:
+            count, total, last, maxTime = self.timings.get(name, [0, 0.0, 0.0, 0.0])
+        return count, total/count if count > 0 else 0.0, last, maxTime
+
+    @contextmanager
+    def timer(self, name):
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addTiming(name, time.perf_counter() - startTime)
+
+    def getText(self):
+        get = self.get
+        lines = []
+        lines.append(f"CACHE hit {get('cache.hits')} neg {get('cache.negativeHits')} miss {get('cache.misses')}")
+        lines.append(f"CACHE {get('cache.entries')} ent {formatBytes(get('cache.bytes'))} evict {get('cache.evictions')}")
+        _, load, _, _ = self.getTiming("cache.load")
+        _, save, _, _ = self.getTiming("cache.save")
+        lines.append(f"CACHE load {load*1000:.1f}ms save {save*1000:.1f}ms")
+        for name, label in (("edsm", "EDSM"), ("dcoh", "DCoH")):
+            _, average, last, _ = self.getTiming(f"{name}.latency")
+            lines.append(f"{label} {get(f'{name}.requests')} req {formatBytes(get(f'{name}.bytes'))} {last*1000:.0f}/{average*1000:.0f}ms")
+        return "\n".join(lines)
+
+def formatBytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024: return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+metrics = Metrics()
@@ -0,0 +1,161 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from threading import Lock
+import random
+import time
+
+from nextstop.metrics import metrics
+
+#connect and read timeout in seconds
+TIMEOUT = (5, 30)
+#connections kept alive per host
+POOL_SIZE = 4
+USER_AGENT = "EDMC-NextStop"
+#retries and backoff in seconds for server errors and timeouts
+MAX_RETRIES = 5
+BACKOFF_BASE = 1
+BACKOFF_CAP = 60
+
+def getBackoff(attempt):
+    #exponential backoff with full jitter
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE*2**attempt))
+
+class RateLimiter:
+    """
+    Token bucket filled from the X-Rate-Limit-Limit/-Remaining/-Reset headers of every response,
+    so requests are paced ahead of time instead of waiting after a 429.
+    The bucket is shared by every worker run talking to the same host.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        #None until the first response with rate limit headers
+        self.tokens = None
+        self.limit = 0
+        #tokens per second
+        self.rate = 0.0
+        self.updated = time.monotonic()
+        #monotonic time when the server resets the limit
+        self.resetAt = 0.0
+
+    def refill(self, now):
+        if self.tokens is None: return
+        self.tokens = min(self.limit, self.tokens + (now - self.updated)*self.rate)
+        self.updated = now
+
+    def update(self, headers, throttled=False):
+        try:
+            limit = int(headers.get("X-Rate-Limit-Limit", "") or -1)
+            remaining = int(headers.get("X-Rate-Limit-Remaining", "") or -1)
+            reset = int(headers.get("X-Rate-Limit-Reset", "") or -1)
+        except ValueError:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if reset >= 0:
+                #the reset is either a unix time or seconds from now
+                resetSec = max(reset - time.time(), 0) if reset > 1000000000 else reset
+                self.resetAt = now + resetSec
+            else:
+                resetSec = -1
+            if limit > 0 and remaining >= 0:
+                self.limit = limit
+                self.tokens = remaining
+                self.updated = now
+                #the server refills the missing requests until the reset
+                if resetSec > 0 and remaining < limit:
+                    self.rate = (limit - remaining)/resetSec
+            if throttled:
+                self.tokens = 0
+                self.updated = now
+                if resetSec > 0 and self.limit > 0: self.rate = self.limit/resetSec
+
+    def hasReset(self):
+        """
+        :return: True if the server told when the limit resets and that time is still ahead
+        """
+        with self.lock:
+            return self.resetAt > time.monotonic()
+
+    def acquire(self, stopEvent):
+        """
+        Wait for a token.
+        :return: False if stopEvent was set while waiting
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                if self.tokens is None or self.tokens >= 1:
+                    if self.tokens is not None: self.tokens -= 1
+                    return True
+                if self.rate > 0:
+                    wait = (1 - self.tokens)/self.rate
+                elif now >= self.resetAt:
+                    #a 429 without a limit header, probe with one request after the reset
+                    self.tokens = None
+                    return True
+                else:
+                    wait = self.resetAt - now
+            if stopEvent.wait(timeout=wait): return False
+
+class HTTPClient:
+    """
+    Long-lived HTTP sessions, one per host, shared by all workers.
+    Connections are pooled and kept alive between worker runs, every request gets a timeout
+    and gzip/deflate responses are decompressed by requests.
+    """
+
+    def __init__(self, timeout=TIMEOUT):
+        self.timeout = timeout
+        self.lock = Lock()
+        #host: session
+        self.sessions = {}
+        #host: rate limiter
+        self.limiters = {}
+
+    def getLimiter(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            return self.limiters.setdefault(host, RateLimiter())
+
+    def getSession(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            session = self.sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"})
+                self.sessions[host] = session
+            return session
+
+    def request(self, method, url, metricName="", **kwargs):
+        """
+        :param metricName: Prefix of the request count, bytes and latency metrics
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        session = self.getSession(url)
+        startTime = time.perf_counter()
+        response = session.request(method, url, **kwargs)
+        if metricName:
+            metrics.addTiming(f"{metricName}.latency", time.perf_counter() - startTime)
+            metrics.incr(f"{metricName}.requests")
+            metrics.incr(f"{metricName}.bytes", len(response.content))
+        #every response keeps the rate limiter of its host up to date
+        self.getLimiter(url).update(response.headers, response.status_code == 429)
+        return response
+
+    def get(self, url, **kwargs): return self.request("GET", url, **kwargs)
+    def post(self, url, **kwargs): return self.request("POST", url, **kwargs)
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+
+client = HTTPClient()
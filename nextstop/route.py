@@ -0,0 +1,147 @@
+from itertools import count
+from typing import NamedTuple
+from array import array
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from nextstop.ui.constant import SCOOPABLE_STARS, DANGER_STARS
+
+#every route gets a higher version than the one before
+versions = count(1)
+
+class RouteSystem(NamedTuple):
+    """
+    Immutable system of a route, safe to share between the board, rows and workers without copying.
+    """
+    system: str
+    id64: int
+    pos: tuple
+    starClass: str
+
+class Enrichment(NamedTuple):
+    #need EDSM to check
+    starTypeName: str = ""
+    edsmUrl: str = ""
+
+NO_ENRICHMENT = Enrichment()
+
+def quantisePos(pos):
+    #StarPos has a resolution of 1/32 Ly
+    return (round(pos[0]*32), round(pos[1]*32), round(pos[2]*32))
+
+class Route:
+    """
+    Systems of a plotted route with a version.
+    Star types and EDSM urls live in a side table keyed by id64.
+    Worker results are applied as patches against the version they were computed for,
+    so results for an older route never end up in a newer one.
+    """
+
+    def __init__(self, systems=(), enrichment=None):
+        self.version = next(versions)
+        self.systems = tuple(systems)
+        #id64: Enrichment
+        self.enrichment = enrichment if enrichment is not None else {}
+        #x, y, z of every system in one contiguous array
+        self.positions = array("d")
+        #id64 and quantised position: route index, the first one wins for repeated systems
+        self.indexById = {}
+        self.indexByPos = {}
+        for i, system in enumerate(self.systems):
+            self.positions.extend(system.pos)
+            self.indexById.setdefault(system.id64, i)
+            self.indexByPos.setdefault(quantisePos(system.pos), i)
+        self.analyse()
+
+    @classmethod
+    def fromDicts(cls, systems):
+        #route from dicts with system, id64, pos, starClass and optional starTypeName and edsmUrl
+        enrichment = {}
+        records = []
+        for system in systems:
+            record = RouteSystem(system["system"], system["id64"], tuple(system["pos"]), system["starClass"])
+            records.append(record)
+            if system.get("starTypeName") or system.get("edsmUrl"):
+                enrichment[record.id64] = Enrichment(system.get("starTypeName", ""), system.get("edsmUrl", ""))
+        return cls(records, enrichment)
+
+    def __len__(self): return len(self.systems)
+    def __getitem__(self, index): return self.systems[index]
+    def __iter__(self): return iter(self.systems)
+
+    def carryOver(self, old):
+        """
+        Keep the star types of systems shared with an older route, e.g. after re-plotting around a carrier.
+        :return: Set of id64 which don't need a lookup again
+        """
+        for id64, enrichment in old.enrichment.items():
+            if id64 in self.indexById: self.enrichment.setdefault(id64, enrichment)
+        return set(self.enrichment)
+
+    def analyse(self):
+        size = len(self.systems)
+        #distance travelled from the first system to every system
+        self.cumulative = array("d", [0.0])*size
+        for i in range(1, size):
+            self.cumulative[i] = self.cumulative[i-1] + math.dist(self.systems[i-1].pos, self.systems[i].pos)
+        #index of the next scoopable and danger star after every system, -1 if none
+        self.nextScoopable = array("l", [-1])*size
+        self.nextDanger = array("l", [-1])*size
+        nextScoopable = nextDanger = -1
+        for i in range(size-1, -1, -1):
+            self.nextScoopable[i] = nextScoopable
+            self.nextDanger[i] = nextDanger
+            starClass = self.systems[i].starClass
+            if starClass in SCOOPABLE_STARS: nextScoopable = i
+            if starClass in DANGER_STARS: nextDanger = i
+
+    def getRemainingDistance(self, index):
+        if index < 0 or index >= len(self.systems): return 0.0
+        return self.cumulative[-1] - self.cumulative[index]
+
+    def getJumpsToScoopable(self, index):
+        #jumps from index to the next scoopable star, -1 if there is none
+        if index < 0 or index >= len(self.systems) or self.nextScoopable[index] < 0: return -1
+        return self.nextScoopable[index] - index
+
+    def getJumpsToDanger(self, index):
+        #jumps from index to the next danger star, -1 if there is none
+        if index < 0 or index >= len(self.systems) or self.nextDanger[index] < 0: return -1
+        return self.nextDanger[index] - index
+
+    def indexOf(self, id64=0, pos=None):
+        """
+        :return: Route index of the system with id64, or at pos if id64 is unknown, -1 if not found
+        """
+        index = self.indexById.get(id64, -1) if id64 else -1
+        if index < 0 and pos is not None:
+            index = self.indexByPos.get(quantisePos(pos), -1)
+        return index
+
+    def getDistances(self, pos):
+        """
+        Distance from pos to every system in one pass.
+        :return: List of distances in route order
+        """
+        if len(self.systems) <= 0: return []
+        if numpy is not None:
+            points = numpy.frombuffer(self.positions, dtype=numpy.float64).reshape(-1, 3)
+            return numpy.sqrt(((points - numpy.asarray(pos, dtype=numpy.float64))**2).sum(axis=1)).tolist()
+        positions = self.positions
+        return [math.dist(pos, positions[i:i+3]) for i in range(0, len(positions), 3)]
+
+    def getEnrichment(self, id64): return self.enrichment.get(id64, NO_ENRICHMENT)
+
+    def applyPatch(self, version, patch):
+        """
+        :param patch: Dict of id64: (starTypeName, edsmUrl)
+        :return: False if the patch is for another version
+        """
+        if version != self.version: return False
+        for id64, (starTypeName, edsmUrl) in patch.items():
+            self.enrichment[id64] = Enrichment(starTypeName, edsmUrl)
+        return True
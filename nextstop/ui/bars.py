@@ -10,13 +10,20 @@ class FancyBar(BaseWidget):
         super().__init__(board, canvas, x, y, width, height)
         self.systemName = ""
         self.jumps = 0
+        self.distance = 0.0
+        #jumps to the next scoopable and danger star, -1 if none
+        self.fuelJumps = -1
+        self.dangerJumps = -1
 
     def setupStyle(self):
         self.styles = styles = {}
         colors = self.board.colors
 
-        margin = toPix(self.canvas, "5p")
-        lineLength = toPix(self.canvas, "17.5p")
+        pt = self.board.pt
+        margin = pt(5)
+        lineLength = pt(17.5)
+        countWidth = pt(16)
+        logoWidth = pt(14)
 
         styles["bg"] = {"type": "rect", "x0": 0, "x1": self.width, "y0": 0, "y1": self.height, "options": {"fill": colors["bg"], "outline": ""}}
 
@@ -25,6 +32,12 @@ class FancyBar(BaseWidget):
         styles["remaining"] = {"type": "text", "x": margin,              "y": self.height-margin-lineLength/2, "options": {"anchor": tk.W,      "fill": colors["textMinor"], "font": ('Helvetica', 9)}}
         styles["jump"] =      {"type": "text", "x": self.width/2-margin, "y": self.height-margin-lineLength/2, "options": {"anchor": tk.E,      "fill": colors["textMinor"], "font": ('Helvetica', 10, 'bold')}}
         styles["min"] =       {"type": "text", "x": self.width/2+margin, "y": self.height-margin-lineLength/2, "options": {"anchor": tk.W,      "fill": colors["textMinor"], "font": ('Helvetica', 10, 'bold')}}
+        #remaining distance and look-ahead
+        styles["distance"] =    {"type": "text", "x": margin,                                    "y": margin, "options": {"anchor": tk.NW, "fill": colors["textMinor"], "font": ('Helvetica', 9)}}
+        styles["dangerJumps"] = {"type": "text", "x": self.width-margin,                         "y": margin, "options": {"anchor": tk.NE, "fill": colors["textMinor"], "font": ('Helvetica', 9)}}
+        styles["dangerLogo"] =  {"type": "text", "x": self.width-margin-countWidth,              "y": margin, "options": {"anchor": tk.NE, "fill": DANGERCOLOR,         "font": (LOGOFONT, 12)}}
+        styles["fuelJumps"] =   {"type": "text", "x": self.width-margin-countWidth-logoWidth,    "y": margin, "options": {"anchor": tk.NE, "fill": colors["textMinor"], "font": ('Helvetica', 9)}}
+        styles["fuelLogo"] =    {"type": "text", "x": self.width-margin-countWidth*2-logoWidth,  "y": margin, "options": {"anchor": tk.NE, "fill": colors["textMinor"], "font": (LOGOFONT, 12)}}
         
         styles["div"] =    {"type": "line", "x0": self.width/2, "x1": self.width/2, "y0": self.height-margin-lineLength, "y1": self.height-margin, "options": {"fill": colors["minor1"], "width": "1.5p"}}
         styles["bottom"] = {"type": "line", "x0": 0,            "x1": self.width,   "y0": self.height,                   "y1": self.height,        "options": {"fill": colors["minor1"], "width": "3p"}}
@@ -43,9 +56,24 @@ class FancyBar(BaseWidget):
             if hours >= 1: minText += f"{formatText(hours, HOUR_STR, HOURS_STR)} "
             if mins >= 1: minText += formatText(mins, MIN_STR, MINS_STR)
         styles["min"]["options"]["text"] = minText
+        styles["distance"]["options"]["text"] = f"{self.distance:.0f} Ly" if self.distance > 0 else ""
+        #look-ahead is only shown with a next stop
+        lookAhead = {"fuelLogo": FUELSTARLOGO, "fuelJumps": self.fuelJumps, "dangerLogo": DANGERLOGO, "dangerJumps": self.dangerJumps}
+        for k, v in lookAhead.items():
+            if not self.systemName: v = ""
+            elif isinstance(v, int): v = str(v) if v >= 0 else "-"
+            styles[k]["options"]["text"] = v
     
-    def updateText(self, systemName="", jumps=0):
+    def updateText(self, systemName="", jumps=0, distance=0.0, fuelJumps=-1, dangerJumps=-1):
+        """
+        :param distance: Remaining light-years
+        :param fuelJumps: Jumps to the next scoopable star, -1 if none
+        :param dangerJumps: Jumps to the next danger star, -1 if none
+        """
         self._setter("systemName", systemName)
         self._setter("jumps", jumps)
+        self._setter("distance", distance)
+        self._setter("fuelJumps", fuelJumps)
+        self._setter("dangerJumps", dangerJumps)
         if len(self.objs) <= 0: self.draw()
         else: self.update(True)
\ No newline at end of file
@@ -1,4 +1,8 @@
 from nextstop.ui.constant import *
+from nextstop.metrics import metrics
+from nextstop.route import Route, RouteSystem, NO_ENRICHMENT
+from nextstop.ui.textfit import TextFitter
+from nextstop.ui.display import TkBackend, layoutStyles, diffDisplayList, shiftDisplayList
 
 import tkinter as tk
 from theme import theme
@@ -6,6 +10,7 @@ from theme import theme
 from abc import ABC, abstractmethod
 import copy
 import webbrowser
+import time
 
 from config import appname, config
 import logging
@@ -14,17 +19,30 @@ logger = logging.getLogger(f"{appname}.EDMC-NextStop")
 class BaseBoard(ABC):
 
     def __init__(self, frame: tk.Frame):
-        self.route = []
+        self.route = Route()
         self.thargoidSystems= {}
         self.currentIndex = -1
-        self.currentPos = [0.0, 0.0, 0.0]
+        self.currentPos = (0.0, 0.0, 0.0)
+        #SystemAddress of the current system, 0 if unknown
+        self.currentID64 = 0
+        #distance from currentPos to every system, updated only when the route or position changes
+        self.distances = []
         self.jumping = False
         self.size = frame.winfo_fpixels(SIZE)
         self.styles = {}
         self.rows: list[BaseRow] = []
+        #row height and the space above the first row
+        self.rowHeight = 0
+        self.rowOffset = 0
         #create canvas
         self.canvas = tk.Canvas(frame, width=self.size, height=0, bd=0, highlightthickness=0)
         self.canvas.grid()
+        #pixels per point and the min board size, resolved once per scaling change
+        self.pointSize = 0.0
+        self.minSize = 0.0
+        self.updatePointSize()
+        #memoised font sizes of long texts
+        self.textFitter = TextFitter(self.canvas)
         #make canvas scrollable (1 scroll in Windows equal 120)
         self.canvas.bind('<MouseWheel>', self.onCanvasScroll)
 
@@ -33,6 +51,13 @@ class BaseBoard(ABC):
         #for stopping old event
         self.resizeEventID = ""
 
+        #frame scheduler, redraw requests ("scroll", "data", "size", "theme") are gathered and run in one pass
+        self.dirty = set()
+        self.moveY = False
+        self.frameID = ""
+        self.lastFrame = 0.0
+        self.frameBudget = FRAME_BUDGET/1000
+
         #debug
         self.debugVar = tk.StringVar()
         self.debugLabel = tk.Label(frame, fg="#00FF00", bg="#000000", font=("Consolas", 9, "bold"), textvariable=self.debugVar, anchor=tk.W, justify=tk.LEFT)
@@ -52,58 +77,110 @@ class BaseBoard(ABC):
         ms = duration*1000
         fps = 1.0/duration if duration > 0 else 0
 
-        text = f"FPS: {fps:.0f}\nROW: {rowCount}\n{ms:.1f}ms"
+        text = f"FPS: {fps:.0f}\nROW: {rowCount}\n{ms:.1f}ms\n{metrics.getText()}"
         self.debugVar.set(text)
 
-    def setRoute(self, route): self.route = copy.deepcopy(route)
-    def getRoute(self): return copy.deepcopy(self.route)
+    #the route keeps its version, so it can be moved to a new board while a worker is running
+    #route systems are immutable and shared without copying
+    def setRoute(self, route):
+        self.route = route if isinstance(route, Route) else Route.fromDicts(route)
+        self.distances = self.route.getDistances(self.currentPos)
+    def getRoute(self): return self.route
+    def applyPatch(self, version, patch): return self.route.applyPatch(version, patch)
     def setThargoidSystems(self, thargoidSystems): self.thargoidSystems = copy.deepcopy(thargoidSystems)
     def getThargoidSystems(self): return copy.deepcopy(self.thargoidSystems)
-    def setCurrentPos(self, currentPos): self.currentPos = copy.deepcopy(list(currentPos))
-    def getCurrentPos(self): return copy.deepcopy(self.currentPos)
-    def getSystemPos(self, index): return copy.deepcopy(self.route[index]["pos"])
+    def setCurrentPos(self, currentPos, id64=0):
+        self.currentID64 = id64
+        currentPos = tuple(currentPos)
+        if currentPos == self.currentPos: return
+        self.currentPos = currentPos
+        self.distances = self.route.getDistances(currentPos)
+    def getCurrentPos(self): return self.currentPos
+    def getCurrentID64(self): return self.currentID64
+    def getSystemPos(self, index): return self.route[index].pos
 
     def updateCurrentIndex(self):
         #no route
         if len(self.route) <= 0:
             self.currentIndex = -1
             return
-        
-        currentPos = self.getCurrentPos()
-        currentIndex = max(self.currentIndex, 0)
-        #set it to 0 or current value
-        if self.route[currentIndex]["pos"] == currentPos:
-            self.currentIndex = currentIndex
-            return
-        
-        for i in range(1, 4):
-            #look down
-            if currentIndex+i < len(self.route) and self.route[currentIndex+i]["pos"] == currentPos:
-                self.currentIndex = currentIndex+i
-                return
-            #look up
-            if currentIndex-i >= 0 and self.route[currentIndex-i]["pos"] == currentPos:
-                self.currentIndex = currentIndex-i
-                return
-        
-        #look in route
-        for i, system in enumerate(self.route):
-            if system["pos"] == currentPos:
-                self.currentIndex = i
-                return
-
-        #not found
-        self.currentIndex = -1
+        #hash lookup by SystemAddress, then by StarPos
+        self.currentIndex = self.route.indexOf(self.currentID64, self.currentPos)
+
+    def getVisibleRange(self):
+        #first and last route index shown in the canvas
+        if len(self.route) <= 0 or self.rowHeight <= 0: return (0, -1)
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height() - self.rowOffset
+        first = max(int(top//self.rowHeight), 0)
+        last = min(int(bottom//self.rowHeight), len(self.route)-1)
+        return (first, last)
+
+    def getRouteOffset(self, poolSize):
+        #current top Y after scrolling
+        top = self.canvas.canvasy(0)
+        #calculate how many row is scrolled
+        routeOffset = int(top//self.rowHeight)
+        #limit the offset to prevent list index out of bound
+        return max(min(routeOffset, len(self.route)-poolSize), 0)
+
+    def isPoolInView(self):
+        #True while the pooled rows cover every row in view
+        if len(self.rows) <= 0: return True
+        first, last = self.getVisibleRange()
+        poolFirst = self.rows[0].getIndex()-1
+        return poolFirst <= first and last < poolFirst+len(self.rows)
+
+    def rotateRows(self, routeOffset):
+        #rearrange row objects to reduce the update call
+        if len(self.rows) <= 0: return
+        #how many row should rearrange
+        delta = self.rows[0].getIndex() - (routeOffset+1)
+        if delta != 0 and abs(delta) < len(self.rows):
+            for _ in range(abs(delta)):
+                #pop the first if scroll down else last
+                popIndex = 0 if delta < 0 else -1
+                temp = self.rows.pop(popIndex)
+                if delta < 0: self.rows.append(temp) #first to last
+                else: self.rows.insert(0, temp) #last ot first
 
     def onCanvasScroll(self, event: tk.Event):
         self.canvas.yview_scroll(int(-1*(event.delta/120)), tk.UNITS)
 
+    def updatePointSize(self):
+        """
+        :return: True if the scaling changed since the last call
+        """
+        pointSize = self.toPix("1p")
+        if pointSize == self.pointSize: return False
+        self.pointSize = pointSize
+        self.minSize = self.toPix(SIZE)
+        return True
+
+    def pt(self, points): return points*self.pointSize
+
+    def setupLayout(self):
+        #sizes derived from the point size, called again when the scaling changes
+        pass
+
+    def updateLayoutMetrics(self):
+        """
+        Resolve the point size again and restyle every row if it changed.
+        :return: True if the scaling changed
+        """
+        if not self.updatePointSize(): return False
+        self.textFitter.clear()
+        self.setupLayout()
+        for row in self.rows: row.changed = True
+        return True
+
     def onFrameResize(self, event: tk.Event):
         #return if not parent
         if event.widget != self.canvas.master: return
+        scaled = self.updateLayoutMetrics()
         currentSize = self.canvas.winfo_width()
         #return if same size
-        if event.width == currentSize: return
+        if event.width == currentSize and not scaled: return
         #cancel resize before starting a new one
         if self.resizeEventID:
             self.canvas.after_cancel(self.resizeEventID)
@@ -111,15 +188,15 @@ class BaseBoard(ABC):
             delay = 500
         else:
             delay = 100
-        minSize = self.toPix(SIZE)
+        minSize = self.minSize
         self.size = event.width if event.width > minSize else minSize
-        self.resizeEventID = self.canvas.after(delay, lambda: self.updateCanvas(False))
+        self.resizeEventID = self.canvas.after(delay, lambda: self.requestFrame("size"))
 
     def resizeCanvas(self, bbox, topOffset=0, moveY=True):
         self.resizeEventID = ""
         scrollArea = (bbox[0], bbox[1], bbox[2], bbox[3]+topOffset)
         self.canvas.config(scrollregion=scrollArea)
-        fixedSize = self.toPix(SIZE) + topOffset
+        fixedSize = self.minSize + topOffset
         newHeight = fixedSize if scrollArea[3] >= fixedSize else scrollArea[3]
         #change canvas height
         self.canvas.config(height=newHeight)
@@ -134,12 +211,54 @@ class BaseBoard(ABC):
             fraction = bbox[3]/scrollArea[3] * (self.currentIndex/len(self.route))
             self.canvas.yview_moveto(fraction)
 
+    def requestFrame(self, reason, moveY=False):
+        """
+        Redraw in the next frame, requests before it runs are merged.
+        :param reason: "scroll" only moves the rows, "data" and "size" run updateCanvas, "theme" runs updateTheme
+        :param moveY: Scroll to the current system
+        """
+        self.dirty.add(reason)
+        self.moveY = self.moveY or moveY
+        if self.frameID: return
+        #keep at least one frame budget between two passes
+        wait = self.frameBudget - (time.perf_counter() - self.lastFrame)
+        if wait > 0:
+            self.frameID = self.canvas.after(int(wait*1000)+1, self.runFrame)
+        else:
+            self.frameID = self.canvas.after_idle(self.runFrame)
+
+    def runFrame(self):
+        try:
+            dirty = self.dirty
+            if "data" in dirty or "size" in dirty:
+                self.updateCanvas(self.moveY)
+            elif "scroll" in dirty:
+                self.updateScroll()
+            #requests made during the pass are part of it
+            if "theme" in dirty:
+                self.updateTheme()
+        except Exception as e:
+            logger.error(f"Failed to draw frame! {e}")
+        finally:
+            self.dirty.clear()
+            self.moveY = False
+            self.frameID = ""
+            self.lastFrame = time.perf_counter()
+
     @abstractmethod
     def updateCanvas(self, moveY=True):
+        #a full pass covers every pending row update
+        self.dirty.difference_update(("scroll", "data", "size"))
+        self.moveY = False
+
+    def updateScroll(self):
+        #rows in view after scrolling
         pass
 
     def updateTheme(self):
         theme.update(self.canvas)
+        #a theme change may come with a new scaling
+        if self.updateLayoutMetrics(): self.updateCanvas(False)
 
     def destroy(self):
         self.canvas.destroy()
@@ -159,8 +278,13 @@ class BaseWidget(ABC):
         self.setPos(x, y)
         self.setWidth(width)
         self.setHeight(height)
-        self.objs = {}
+        self.backend = TkBackend(canvas)
+        #name: canvas item id
+        self.objs = self.backend.objs
         self.styles = {}
+        #display list last applied to the canvas and the position it was laid out at
+        self.displayList = {}
+        self.origin = (self.x, self.y)
         self.changed = False
 
     def _setter(self, name, value):
@@ -171,54 +295,50 @@ class BaseWidget(ABC):
     def setWidth(self, width): self._setter("width", width)
     def setHeight(self, height): self._setter("height", height)
     def setPos(self, x, y):
-        self._setter("x", x)
-        self._setter("y", y)
+        #a new position alone does not restyle, update moves the drawn items instead
+        self.x = x
+        self.y = y
 
     @abstractmethod
     def setupStyle(self): pass
 
-    def draw(self):
+    def layout(self):
+        """
+        Pure layout of the widget, needs no canvas.
+        :return: Display list of the current state
+        """
         self.setupStyle()
-        canvas = self.canvas
+        return layoutStyles(self.styles, self.x, self.y)
+
+    def draw(self):
+        displayList = self.layout()
         if len(self.objs) > 0: self.clear()
-        for k, v in self.styles.items():
-            match v["type"]:
-                case "text":
-                    obj = canvas.create_text(self.x+v["x"], self.y+v["y"], **v["options"])
-                case "line":
-                    obj = canvas.create_line(self.x+v["x0"], self.y+v["y0"], self.x+v["x1"], self.y+v["y1"], **v["options"])
-                case "rect":
-                    obj = canvas.create_rectangle(self.x+v["x0"], self.y+v["y0"], self.x+v["x1"], self.y+v["y1"], **v["options"])
-                case _:
-                    logger.error(f"Unknown object type! {k}: {v}")
-                    return
-            self.objs[k] = obj
-            if "event" in v:
-                for name, event in v["event"].items():
-                    canvas.tag_bind(obj, name, event)
+        self.backend.apply(diffDisplayList({}, displayList))
+        self.displayList = displayList
+        self.origin = (self.x, self.y)
+        self.changed = False
         return True
 
     def update(self, toTop=False):
-        if not self.changed: return False
+        moved = self.origin != (self.x, self.y)
+        if not self.changed and not moved: return False
 
         if len(self.objs) <= 0: return self.draw() 
 
-        self.setupStyle()
-        canvas = self.canvas
-        for k, v in self.styles.items():
-            obj = self.objs[k]
-            match v["type"]:
-                case "text":
-                    canvas.coords(obj, self.x+v["x"], self.y+v["y"])
-                case "line" | "rect":
-                    canvas.coords(obj, self.x+v["x0"], self.y+v["y0"], self.x+v["x1"], self.y+v["y1"])
-            canvas.itemconfig(obj, **v["options"])
-            if "event" in v:
-                for name, event in v["event"].items():
-                    canvas.tag_bind(obj, name, event)
-            if toTop:
-                canvas.tag_raise(obj)
-        
+        originX, originY = self.origin
+        dy = self.y - originY
+        if dy and originX == self.x:
+            #a vertical shift is one move of the widget tag
+            self.backend.move(dy, toTop and not self.changed)
+            self.displayList = shiftDisplayList(self.displayList, dy)
+            self.origin = (self.x, self.y)
+            if not self.changed: return True
+
+        displayList = self.layout()
+        #only push what differs from the last frame
+        self.backend.apply(diffDisplayList(self.displayList, displayList), toTop)
+        self.displayList = displayList
+        self.origin = (self.x, self.y)
         self.changed = False
         return True
 
@@ -226,37 +346,35 @@ class BaseWidget(ABC):
         self.setPos(x, y)
         self.update(toTop)
 
-    def updateObj(self, objName, **options):
-        if objName in self.objs:
-            self.canvas.itemconfig(objName, **options)
-        else:
-            logger.error(f"Object ({objName}) not found!")
-
     def clear(self):
-        for id in self.objs.values():
-            self.canvas.delete(id)
-        self.objs.clear()
+        self.backend.clear()
+        self.displayList = {}
 
 class BaseRow(BaseWidget):
 
-    def __init__(self, board, canvas, x, y, width, height, index, system):
+    def __init__(self, board, canvas, x, y, width, height, index, system, enrichment=NO_ENRICHMENT, distance=0.0):
         super().__init__(board, canvas, x, y, width, height)
+        self.showBottomLine(True)
         self.setIndex(index)
-        self.setSystem(system)
+        self.setSystem(system, enrichment)
+        self.setDistance(distance)
 
     def getIndex(self): return getattr(self, "index", 0)
     def setIndex(self, index): self._setter("index", index)
-    def setSystem(self, system): self._setter("system", copy.deepcopy(system))
-
-    def getSystemText(self): return self.system["system"]
-    def getEDSMUrl(self): return self.system["edsmUrl"]
-    def getID64(self): return self.system["id64"]
+    def setSystem(self, system: RouteSystem, enrichment=NO_ENRICHMENT):
+        self._setter("system", system)
+        self._setter("enrichment", enrichment)
+    def setDistance(self, distance): self._setter("distance", distance)
+
+    def getSystemText(self): return self.system.system
+    def getEDSMUrl(self): return self.enrichment.edsmUrl
+    def getID64(self): return self.system.id64
     def getThargoidState(self): return (NORMAL_STR if self.getID64() not in self.board.thargoidSystems else self.board.thargoidSystems[self.getID64()])
 
     def getStarTypeText(self):
-        name = self.system["starTypeName"]
+        name = self.enrichment.starTypeName
         if name != "": return name
-        starClass = self.system["starClass"]
+        starClass = self.system.starClass
         match starClass:
             #* mean uncertain because NavRoute didn't have that info
             #Scoopable
@@ -324,12 +442,12 @@ class BaseRow(BaseWidget):
 
     def getDistanceText(self):
         #get distance
-        distance = self.system["distance"]
+        distance = self.distance
         #format the distance "xxx.xx Ly"
         return CURRENT_STR if distance <= 0 else "%.2f Ly" % distance
 
     def getReminderLogo(self):
-        match self.system["starClass"]:
+        match self.system.starClass:
             #if scoopable
             case v if v in SCOOPABLE_STARS:
                 return FUELSTARLOGO
@@ -339,9 +457,8 @@ class BaseRow(BaseWidget):
             case _:
                 return ""
 
-    def showBottomLine(self, show):
-        state = tk.NORMAL if show else tk.HIDDEN
-        self.canvas.itemconfig(self.objs["bottomLine"], state=state)
+    def showBottomLine(self, show): self._setter("bottomLineShown", show)
+    def getBottomLineState(self): return tk.NORMAL if self.bottomLineShown else tk.HIDDEN
 
     def onEDSMClick(self, event): webbrowser.open(self.getEDSMUrl())
     def onLogoEnter(self, event, cursor=""): self.canvas.config(cursor=cursor)
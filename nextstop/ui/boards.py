@@ -8,72 +8,120 @@ import tkinter as tk
 from theme import theme
 
 import time
+import math
 
 class SimpleBoard(BaseBoard):
 
+    def __init__(self, frame: tk.Frame):
+        super().__init__(frame)
+        self.setupLayout()
+
+    def setupLayout(self):
+        self.rowHeight = self.pt(40)
+        #rows to fill the canvas at max height plus one for scrolling
+        self.poolSize = math.ceil(self.minSize/self.rowHeight)+1
+
     def updateCanvas(self, moveY=True):
         if self.debugMode: startTime = time.perf_counter()
 
         super().updateCanvas()
         canvas = self.canvas
+        routeSize = len(self.route)
         #remove extra row object
-        while len(self.rows) > len(self.route):
+        while len(self.rows) > min(routeSize, self.poolSize):
             row = self.rows.pop()
             row.clear()
+        self.updateCurrentIndex()
         #if no route
-        if len(self.route) <= 0:
+        if routeSize <= 0:
             self.currentIndex = 0
             canvas.delete("all")
             canvas.create_text(0,         0, text=NOROUTEFULL_STR, anchor=tk.NW, justify=tk.LEFT,  tags="noRoute")
             canvas.create_text(self.size, 0, text=DASH6_STR,                              anchor=tk.NE, justify=tk.RIGHT, tags="noRoute")
+            self.resizeCanvas(canvas.bbox("all"), moveY=moveY)
         else:
             canvas.delete("noRoute")
-            #loop through route list
-            rowHeight = self.toPix("40p")
-            for index in range(len(self.route)):
-                system = self.route[index]
-                system["distance"] = distance = getDistance(self.currentPos, system["pos"])
-                if distance <= 0: self.currentIndex = index
-                if index >= len(self.rows):
-                    row = SimpleRow(self, canvas, 0, rowHeight*index, self.size, rowHeight, index+1, system)
-                    row.draw()
-                    self.rows.append(row)
-                else:
-                    row = self.rows[index]
-                    row.setWidth(self.size)
-                    row.setSystem(system)
-                    row.update()
-                #if not bottom
-                notBottom = index+1 < len(self.route)
-                row.showBottomLine(notBottom)
-        self.resizeCanvas(canvas.bbox("all"), moveY=moveY)
-        canvas.after(10, lambda: self.updateTheme())
+            #only the rows in view exist, the scroll region covers the whole route
+            self.resizeCanvas((0, 0, self.size, self.rowHeight*routeSize), moveY=moveY)
+            self.updateRows()
+        self.requestFrame("theme")
 
         if self.debugMode:
             endTime = time.perf_counter()
             self.updateMetrics(endTime - startTime, len(self.rows))
 
+    def updateRows(self):
+        canvas = self.canvas
+        routeSize = len(self.route)
+        rowHeight = self.rowHeight
+
+        poolSize = min(routeSize, self.poolSize)
+        routeOffset = self.getRouteOffset(poolSize)
+        self.rotateRows(routeOffset)
+
+        #loop through the rows in view
+        for rowIndex in range(poolSize):
+            routeIndex = rowIndex + routeOffset
+            system = self.route[routeIndex]
+            enrichment = self.route.getEnrichment(system.id64)
+            distance = self.distances[routeIndex]
+            #if not bottom
+            notBottom = routeIndex+1 < routeSize
+            if rowIndex >= len(self.rows):
+                row = SimpleRow(self, canvas, 0, rowHeight*routeIndex, self.size, rowHeight, routeIndex+1, system, enrichment, distance)
+                row.showBottomLine(notBottom)
+                row.draw()
+                self.rows.append(row)
+            else:
+                row = self.rows[rowIndex]
+                row.setWidth(self.size)
+                row.setHeight(rowHeight)
+                row.setPos(0, rowHeight*routeIndex)
+                row.setIndex(routeIndex+1)
+                row.setSystem(system, enrichment)
+                row.setDistance(distance)
+                row.showBottomLine(notBottom)
+                row.update()
+
     def updateTheme(self):
         super().updateTheme()
         self.canvas.itemconfig("all", fill=theme.current["foreground"], font=theme.current["font"])
         self.canvas.itemconfig("logo", font=(LOGOFONT, 20))
 
+    def updateScroll(self):
+        self.updateRows()
+
+    def onCanvasScroll(self, event: tk.Event):
+        super().onCanvasScroll(event)
+        if len(self.route) > len(self.rows):
+            #rows in view must not wait for the frame, the canvas redraws before it
+            if self.isPoolInView(): self.requestFrame("scroll")
+            else: self.updateRows()
+
 class FancyBoard(BaseBoard):
 
     def __init__(self, frame: tk.Frame):
         super().__init__(frame)
         self.colors = THEME1933
-        self.rowHeight = toPix(self.canvas, SIZE)/MAX_ROWS
-        self.barHeight = self.rowHeight*1.5
+        self.bar = None
+        self.setupLayout()
         #hints
         self.hintsVar = tk.StringVar()
         self.hintsLabel = tk.Label(self.canvas, fg=self.colors["textMinor"], bg=self.colors["bg"], relief=tk.RAISED, bd=1, font=('Helvetica', 9), textvariable=self.hintsVar)
         #hints and bulletLine canvas object id
         self.hintsObj = self.canvas.create_window(0, 0, tags="hints", window=self.hintsLabel, state=tk.HIDDEN, anchor=tk.S)
         self.bulletLineObj = ""
-        self.bar = FancyBar(self, self.canvas, 0, 0, self.size, self.rowHeight*1.5)
+        self.bar = FancyBar(self, self.canvas, 0, 0, self.size, self.barHeight)
         self.bar.draw()
         self.canvas.config(bg=self.colors["bg"])
+
+    def setupLayout(self):
+        self.rowHeight = self.minSize/MAX_ROWS
+        self.barHeight = self.rowHeight*1.5
+        self.rowOffset = self.barHeight
+        if self.bar:
+            self.bar.setHeight(self.barHeight)
+            self.bar.changed = True
     
     def updateCanvas(self, moveY=True):
         if self.debugMode: startTime = time.perf_counter()
@@ -114,7 +162,10 @@ class FancyBoard(BaseBoard):
         if self.currentIndex < 0 or self.currentIndex >= routeSize-1: bar.updateText()
         else:
             nextStopIndex = self.currentIndex+1
-            bar.updateText(f"{nextStopIndex+1}. {self.route[nextStopIndex]["system"]}", routeSize-nextStopIndex)
+            route = self.route
+            index = self.currentIndex
+            bar.updateText(f"{nextStopIndex+1}. {route[nextStopIndex].system}", routeSize-nextStopIndex,
+                           route.getRemainingDistance(index), route.getJumpsToScoopable(index), route.getJumpsToDanger(index))
 
         if self.debugMode:
             endTime = time.perf_counter()
@@ -127,46 +178,34 @@ class FancyBoard(BaseBoard):
 
         #size of the row pool
         poolSize = min(routeSize, MAX_ROWS+1)
-        #current top Y after scrolling
-        top = canvas.canvasy(0)
-        #calculate how many row is scrolled
-        routeOffset = int(top//self.rowHeight)
-        #limit the offset to prevent list index out of bound
-        routeOffset = min(routeOffset, routeSize-poolSize)
-
-        #rearrange row objects to reduce the update call
-        if len(self.rows) > 0:
-            #how many row should rearrange
-            delta = self.rows[0].getIndex() - (routeOffset+1)
-            if delta != 0 and abs(delta) < len(self.rows):
-                for _ in range(abs(delta)):
-                    #pop the first if scroll down else last
-                    popIndex = 0 if delta < 0 else -1
-                    temp = self.rows.pop(popIndex)
-                    if delta < 0: self.rows.append(temp) #first to last
-                    else: self.rows.insert(0, temp) #last ot first
-        
+        routeOffset = self.getRouteOffset(poolSize)
+        self.rotateRows(routeOffset)
+
         #loop through route list
         for rowIndex in range(poolSize):
             routeIndex = rowIndex + routeOffset
             rowPosOffset = self.rowHeight*(routeIndex) + self.barHeight
             system = self.route[routeIndex]
-            system["distance"] = getDistance(self.currentPos, system["pos"])
+            enrichment = self.route.getEnrichment(system.id64)
+            distance = self.distances[routeIndex]
 
+            #if not bottom
+            notBottom = routeIndex+1 < routeSize
             if rowIndex >= len(self.rows):
-                row = FancyRow(self, canvas, 0, rowPosOffset, self.size, self.rowHeight, routeIndex+1, system)
+                row = FancyRow(self, canvas, 0, rowPosOffset, self.size, self.rowHeight, routeIndex+1, system, enrichment, distance)
+                row.showBottomLine(notBottom)
                 row.draw()
                 self.rows.append(row)
             else:
                 row = self.rows[rowIndex]
                 row.setWidth(self.size)
+                row.setHeight(self.rowHeight)
                 row.setPos(0, rowPosOffset)
                 row.setIndex(routeIndex+1)
-                row.setSystem(system)
+                row.setSystem(system, enrichment)
+                row.setDistance(distance)
+                row.showBottomLine(notBottom)
                 row.update()
-            #if not bottom
-            notBottom = routeIndex+1 < routeSize
-            row.showBottomLine(notBottom)
 
         if self.debugMode:
             endTime = time.perf_counter()
@@ -180,11 +219,17 @@ class FancyBoard(BaseBoard):
         y = self.canvas.canvasy(0)
         self.bar.moveTo(x, y, True)
 
+    def updateScroll(self):
+        self.updateRows()
+
     def onCanvasScroll(self, event: tk.Event):
         super().onCanvasScroll(event)
+        #the pinned bar follows right away with one tag move, the canvas redraws before the next frame
+        if self.bar: self.updateBarPosition()
         if len(self.rows) > MAX_ROWS:
-            self.updateBarPosition()
-            self.updateRows()
+            #rows are recycled once per frame unless the scroll went past the pool
+            if self.isPoolInView(): self.requestFrame("scroll")
+            else: self.updateRows()
 
     def showHints(self, x: int, y: int, text: str):
         canvas = self.canvas
@@ -204,7 +249,7 @@ class FancyBoard(BaseBoard):
             #flip the anchor
             canvas.itemconfig("hints", anchor=tk.N)
             #move it below logo
-            canvas.coords("hints", x, y+self.toPix("20p"))
+            canvas.coords("hints", x, y+self.pt(20))
             #force bbox to update
             canvas.update_idletasks()
             bbox = canvas.bbox("hints") # (x1, y1, x2, y2)
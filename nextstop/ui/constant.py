@@ -28,6 +28,8 @@ NORMAL_STR =    "Normal"
 THARGOID_STR =  "Thargoid"
 NEXTSTOP_STR =  "Next stop:"
 REMAINING_STR = "Remaining:"
+NEXTFUEL_STR =  "Next fuel star in"
+NOFUEL_STR =    "No fuel star ahead"
 JUMP_STR =      "Jump"
 JUMPS_STR =      "Jumps"
 HOUR_STR =      "Hour"
@@ -39,4 +41,6 @@ DASH6_STR = "-------"
 NOROUTEFULL_STR = f"{DASH6_STR}{NOROUTE_STR}{DASH6_STR}"
 
 SIZE = "225p"
-MAX_ROWS = 6
\ No newline at end of file
+MAX_ROWS = 6
+#min ms between two layout passes of the frame scheduler
+FRAME_BUDGET = 16
\ No newline at end of file
@@ -0,0 +1,165 @@
+from typing import NamedTuple
+from itertools import count
+import tkinter as tk
+
+from config import appname
+import logging
+logger = logging.getLogger(f"{appname}.EDMC-NextStop")
+
+#ids of the per-widget canvas tags
+tagIds = count(1)
+
+#display list operations
+CREATE = "create"
+DELETE = "delete"
+COORDS = "coords"
+CONFIG = "config"
+BIND = "bind"
+
+class Primitive(NamedTuple):
+    """
+    One canvas item of a display list with absolute coords.
+    """
+    #"text", "line" or "rect"
+    kind: str
+    coords: tuple
+    options: dict
+    #sequence: handler, only bound events
+    events: dict
+
+def layoutStyles(styles, x, y):
+    """
+    Turn widget styles with coords relative to (x, y) into a display list, no Tk involved.
+    :return: Dict of name: Primitive
+    """
+    displayList = {}
+    for name, style in styles.items():
+        match style["type"]:
+            case "text":
+                coords = (x+style["x"], y+style["y"])
+            case "line" | "rect":
+                coords = (x+style["x0"], y+style["y0"], x+style["x1"], y+style["y1"])
+            case _:
+                logger.error(f"Unknown object type! {name}: {style}")
+                continue
+        events = {sequence: handler for sequence, handler in style.get("event", {}).items() if handler}
+        displayList[name] = Primitive(style["type"], coords, style["options"], events)
+    return displayList
+
+def shiftDisplayList(displayList, dy):
+    """
+    :return: Display list moved down by dy
+    """
+    return {name: primitive._replace(coords=tuple(value+dy if i % 2 else value for i, value in enumerate(primitive.coords))) for name, primitive in displayList.items()}
+
+def diffDisplayList(old, new):
+    """
+    :return: Operations turning the old display list into the new one:
+        (CREATE, name, primitive), (DELETE, name), (COORDS, name, coords), (CONFIG, name, options)
+        and (BIND, name, sequence, handler) where an empty handler removes the binding
+    """
+    ops = []
+    for name, primitive in new.items():
+        oldPrimitive = old.get(name)
+        #Tk can't unset an item option, a primitive which drops or adds one is recreated
+        if oldPrimitive is None or oldPrimitive.kind != primitive.kind or oldPrimitive.options.keys() != primitive.options.keys():
+            if oldPrimitive is not None: ops.append((DELETE, name))
+            ops.append((CREATE, name, primitive))
+            continue
+        if primitive.coords != oldPrimitive.coords:
+            ops.append((COORDS, name, primitive.coords))
+        oldOptions = oldPrimitive.options
+        options = {key: value for key, value in primitive.options.items() if oldOptions[key] != value}
+        if options:
+            ops.append((CONFIG, name, options))
+        #handlers are compared by equality, bound methods of the same widget are equal
+        if primitive.events != oldPrimitive.events:
+            for sequence in primitive.events.keys() | oldPrimitive.events.keys():
+                handler = primitive.events.get(sequence, "")
+                if handler != oldPrimitive.events.get(sequence, ""):
+                    ops.append((BIND, name, sequence, handler))
+    for name in old.keys() - new.keys():
+        ops.append((DELETE, name))
+    return ops
+
+class TkBackend:
+    """
+    Applies display list operations to a canvas.
+    Keeps the canvas item id and the bindings of every primitive of one widget,
+    all items of the widget share one tag so it can be moved, raised or deleted with a single call.
+    """
+
+    def __init__(self, canvas: tk.Canvas):
+        self.canvas = canvas
+        self.tag = f"widget{next(tagIds)}"
+        #name: canvas item id
+        self.objs = {}
+        #name: {sequence: funcid}
+        self.bindings = {}
+
+    def apply(self, ops, toTop=False):
+        canvas = self.canvas
+        for op in ops:
+            name = op[1]
+            kind = op[0]
+            if kind == COORDS:
+                canvas.coords(self.objs[name], *op[2])
+            elif kind == CONFIG:
+                canvas.itemconfig(self.objs[name], **self.withTag(op[2]))
+            elif kind == BIND:
+                self.bind(name, op[2], op[3])
+            elif kind == CREATE:
+                self.create(name, op[2])
+            elif kind == DELETE:
+                self.delete(name)
+        if toTop: canvas.tag_raise(self.tag)
+
+    def withTag(self, options):
+        #the widget tag is added to the tags of the style
+        if "tags" not in options: return options
+        tags = options["tags"]
+        tags = (tags,) if isinstance(tags, str) else tuple(tags)
+        return {**options, "tags": tags + (self.tag,)}
+
+    def move(self, dy, toTop=False):
+        self.canvas.move(self.tag, 0, dy)
+        if toTop: self.canvas.tag_raise(self.tag)
+
+    def create(self, name, primitive: Primitive):
+        canvas = self.canvas
+        options = self.withTag({"tags": (), **primitive.options})
+        match primitive.kind:
+            case "text":
+                obj = canvas.create_text(*primitive.coords, **options)
+            case "line":
+                obj = canvas.create_line(*primitive.coords, **options)
+            case "rect":
+                obj = canvas.create_rectangle(*primitive.coords, **options)
+        self.objs[name] = obj
+        self.bindings[name] = {}
+        for sequence, handler in primitive.events.items():
+            self.bind(name, sequence, handler)
+
+    def bind(self, name, sequence, handler):
+        obj = self.objs[name]
+        bindings = self.bindings[name]
+        funcid = bindings.pop(sequence, None)
+        #unbinding with the funcid also deletes the Tcl command of the old handler
+        if funcid: self.canvas.tag_unbind(obj, sequence, funcid)
+        if handler: bindings[sequence] = self.canvas.tag_bind(obj, sequence, handler)
+
+    def delete(self, name):
+        obj = self.objs.pop(name, None)
+        if obj is None: return
+        self.canvas.delete(obj)
+        for funcid in self.bindings.pop(name, {}).values():
+            self.canvas.deletecommand(funcid)
+
+    def clear(self):
+        if not self.objs: return
+        self.canvas.delete(self.tag)
+        for bindings in self.bindings.values():
+            for funcid in bindings.values():
+                self.canvas.deletecommand(funcid)
+        self.objs.clear()
+        self.bindings.clear()
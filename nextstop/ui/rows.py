@@ -7,18 +7,18 @@ import tkinter as tk
 class SimpleRow(BaseRow):
 
     def getLineText(self):
-        count = self.width/toPix(self.canvas, "3p")
+        count = self.width/self.board.pt(3)
         return "-"*round(count+.5)
 
     def setupStyle(self):
         self.styles = styles = {}
-        canvas = self.canvas
-        lineOffset = toPix(canvas, "10p")
+        pt = self.board.pt
+        lineOffset = pt(10)
         styles["system"] =       {"type": "text", "x": 0,                       "y": 0,            "options": {"anchor": tk.NW, "justify": tk.LEFT}}
         styles["starType"] =     {"type": "text", "x": 0,                       "y": lineOffset,   "options": {"anchor": tk.NW, "justify": tk.LEFT}}
         styles["state"] =        {"type": "text", "x": 0,                       "y": lineOffset*2, "options": {"anchor": tk.NW, "justify": tk.LEFT}}
         styles["distance"] =     {"type": "text", "x": self.width,              "y": 0,            "options": {"anchor": tk.NE, "justify": tk.RIGHT}}
-        logoOffset = toPix(canvas, "20p")
+        logoOffset = pt(20)
         styles["reminder"] =     {"type": "text", "x": self.width,              "y": lineOffset,   "options": {"anchor": tk.NE, "justify": tk.RIGHT,  "tags": "logo", "font": (LOGOFONT, 20)}}
         styles["edsmLogo"] =     {"type": "text", "x": self.width-logoOffset,   "y": lineOffset,   "options": {"anchor": tk.NE, "justify": tk.RIGHT,  "tags": "logo", "font": (LOGOFONT, 20)}}
         styles["thargoidLogo"] = {"type": "text", "x": self.width-logoOffset*2, "y": lineOffset,   "options": {"anchor": tk.NE, "justify": tk.RIGHT,  "tags": "logo", "font": (LOGOFONT, 20)}}
@@ -35,19 +35,23 @@ class SimpleRow(BaseRow):
         styles["edsmLogo"]["options"]["text"] = edsmLogo
         styles["thargoidLogo"]["options"]["text"] = "" if self.getThargoidState() == NORMAL_STR else THARGOIDWARLOGO
         styles["bottomLine"]["options"]["text"] = self.getLineText()
+        styles["bottomLine"]["options"]["state"] = self.getBottomLineState()
 
         #setup edsm logo event
         if edsmLogo:
-            styles["edsmLogo"]["event"] = {"<Button-1>": self.onEDSMClick, "<Enter>": lambda event, cursor="hand2": self.onLogoEnter(event, cursor), "<Leave>": self.onLogoLeave}
+            styles["edsmLogo"]["event"] = {"<Button-1>": self.onEDSMClick, "<Enter>": self.onEDSMEnter, "<Leave>": self.onLogoLeave}
         else:
             #clear event
             styles["edsmLogo"]["event"] = {"<Button-1>": "", "<Enter>": "", "<Leave>": ""}
 
+    def onEDSMEnter(self, event: tk.Event): self.onLogoEnter(event, "hand2")
+
 class FancyRow(BaseRow):
 
     def setupStyle(self):
         self.styles = styles = {}
         colors = self.board.colors
+        pt = self.board.pt
         #text style
         if self.getDistanceText() == CURRENT_STR:
             bulletBGColor = bulletFGColor = colors["main"]
@@ -59,17 +63,17 @@ class FancyRow(BaseRow):
         styles["routeI"] =       {"type": "text", "x": self.height,                         "y": self.height*.3, "options": {"anchor": tk.W,      "fill": colors["textMain"],  "font": ('Helvetica', 12)}}
         #count the route index digit
         indexDigit = len(f"{self.index}")
-        sysTexOffset = toPix(self.canvas, f"{indexDigit*6 + 8}p")
+        sysTexOffset = pt(indexDigit*6 + 8)
         styles["system"] =       {"type": "text", "x": self.height+sysTexOffset,            "y": self.height*.3, "options": {"anchor": tk.W,      "fill": colors["textMain"],  "font": ('Helvetica', 12)}}
         styles["starType"] =     {"type": "text", "x": self.height,                         "y": self.height*.7, "options": {"anchor": tk.W,      "fill": colors["textMinor"], "font": ('Helvetica', 9)}}
-        rightOffset = toPix(self.canvas, "12p")
+        rightOffset = pt(12)
         styles["distance"] =     {"type": "text", "x": self.width-rightOffset,              "y": self.height*.3, "options": {"anchor": tk.E,      "fill": colors["textMinor"], "font": ('Helvetica', 11)}}
-        logoOffset = toPix(self.canvas, "20p")
+        logoOffset = pt(20)
         styles["reminder"] =     {"type": "text", "x": self.width-rightOffset,              "y": self.height*.7, "options": {"anchor": tk.E,      "fill": colors["textMinor"], "font": (LOGOFONT,    20)}}
         styles["edsmLogo"] =     {"type": "text", "x": self.width-rightOffset-logoOffset,   "y": self.height*.7, "options": {"anchor": tk.E,      "fill": colors["textMinor"], "font": (LOGOFONT,    20)}}
         styles["thargoidLogo"] = {"type": "text", "x": self.width-rightOffset-logoOffset*2, "y": self.height*.7, "options": {"anchor": tk.E,      "fill": colors["textMinor"], "font": (LOGOFONT,    20)}}
         #line style
-        lineOffset = toPix(self.canvas, "6p")
+        lineOffset = pt(6)
         styles["bottomLine"] =   {"type": "line", "x0": lineOffset,    "x1": self.width-lineOffset, "y0": self.height,   "y1": self.height,   "options": {"fill": colors["minor1"], "width": "0.766p"}}
 
         styles["routeI"]["options"]["text"] = f"{self.index}. "
@@ -82,22 +86,27 @@ class FancyRow(BaseRow):
         styles["edsmLogo"]["options"]["text"] = edsmLogo
         thargoidLogo = "" if self.getThargoidState() == NORMAL_STR else THARGOIDWARLOGO
         styles["thargoidLogo"]["options"]["text"] = thargoidLogo
+        styles["bottomLine"]["options"]["state"] = self.getBottomLineState()
+
+        #shrink long texts to fit, the sizes are memoised so known systems cost no Tk call
+        fit = self.board.textFitter.fit
+        for name, width in (("system", self.width*.56-sysTexOffset), ("starType", self.width*.52), ("distance", self.width*.23)):
+            options = styles[name]["options"]
+            options["font"] = fit(options["text"], options["font"], width)
+            options["width"] = width
 
         #setup reminder logo
         if reminderLogo:
             if reminderLogo == DANGERLOGO:
-                hintsText = DANGER_STR
                 styles["reminder"]["options"]["fill"] = DANGERCOLOR
-            elif reminderLogo == FUELSTARLOGO:
-                hintsText = FUELSTAR_STR
-            styles["reminder"]["event"] = {"<Enter>": lambda event, text=hintsText: self.onLogoEnter(event, "reminder", text=text), "<Leave>": self.onLogoLeave}
+            styles["reminder"]["event"] = {"<Enter>": self.onReminderEnter, "<Leave>": self.onLogoLeave}
         else:
             #clear event
             styles["reminder"]["event"] = {"<Enter>": "", "<Leave>": ""}
         
         #setup edsm logo event
         if edsmLogo:
-            styles["edsmLogo"]["event"] = {"<Button-1>": self.onEDSMClick, "<Enter>": lambda event: self.onLogoEnter(event, "edsmLogo", "hand2", OPENEDSM_STR), "<Leave>": self.onLogoLeave}
+            styles["edsmLogo"]["event"] = {"<Button-1>": self.onEDSMClick, "<Enter>": self.onEDSMEnter, "<Leave>": self.onLogoLeave}
         else:
             #clear event
             styles["edsmLogo"]["event"] = {"<Button-1>": "", "<Enter>": "", "<Leave>": ""}
@@ -105,17 +114,18 @@ class FancyRow(BaseRow):
         #setup thargoid logo
         if thargoidLogo:
             styles["thargoidLogo"]["options"]["fill"] = THARGOIDCOLORS[self.getThargoidState()]
-            styles["thargoidLogo"]["event"] = {"<Enter>": lambda event, text=f"{THARGOID_STR} {self.getThargoidState()}": self.onLogoEnter(event, "thargoidLogo", text=text), "<Leave>": self.onLogoLeave}            
+            styles["thargoidLogo"]["event"] = {"<Enter>": self.onThargoidEnter, "<Leave>": self.onLogoLeave}
         else:
             #clear event
             styles["thargoidLogo"]["event"] = {"<Enter>": "", "<Leave>": ""}
 
-    def draw(self):
-        super().draw()
-        self.resizeCanvasText()
-
-    def update(self):
-        if super().update(): self.resizeCanvasText()
+    def getReminderHint(self):
+        #the fuel star gap comes from the current route, the row may not restyle after a re-plot
+        hintsText = DANGER_STR if self.getReminderLogo() == DANGERLOGO else FUELSTAR_STR
+        fuelJumps = self.board.route.getJumpsToScoopable(self.index-1)
+        if fuelJumps > 0: hintsText += f"\n{NEXTFUEL_STR} {formatText(fuelJumps, JUMP_STR, JUMPS_STR)}"
+        else: hintsText += f"\n{NOFUEL_STR}"
+        return hintsText
 
     def onLogoEnter(self, event: tk.Event, objName, cursor="", text=""):
         super().onLogoEnter(event, cursor)
@@ -125,20 +135,15 @@ class FancyRow(BaseRow):
             y = bbox[1] #y1
         else:
             x = self.canvas.canvasx(event.x)
-            gap = toPix(self.canvas, "5p")
+            gap = self.board.pt(5)
             y = self.canvas.canvasy(event.y)-gap
         self.board.showHints(x, y, text)
 
+    #stable handlers, so the bindings only change when a logo appears or disappears
+    def onReminderEnter(self, event: tk.Event): self.onLogoEnter(event, "reminder", text=self.getReminderHint())
+    def onEDSMEnter(self, event: tk.Event): self.onLogoEnter(event, "edsmLogo", "hand2", OPENEDSM_STR)
+    def onThargoidEnter(self, event: tk.Event): self.onLogoEnter(event, "thargoidLogo", text=f"{THARGOID_STR} {self.getThargoidState()}")
+
     def onLogoLeave(self, event: tk.Event):
         super().onLogoLeave(event)
-        self.board.hideHints()
-
-    def resizeCanvasText(self):
-        objs = self.objs
-        #count the route index digit
-        indexDigit = len(f"{self.index}")
-        sysTexOffset = toPix(self.canvas, f"{indexDigit*6 + 8}p")
-        #make text resize dynamically
-        resizeCanvasText(self.canvas, objs["system"],   self.width*.56-sysTexOffset)
-        resizeCanvasText(self.canvas, objs["starType"], self.width*.52)
-        resizeCanvasText(self.canvas, objs["distance"], self.width*.23)
\ No newline at end of file
+        self.board.hideHints()
\ No newline at end of file
@@ -0,0 +1,55 @@
+import tkinter as tk
+import tkinter.font as tkfont
+
+#fitted sizes kept before the memo starts over
+MAX_ENTRIES = 4096
+
+class TextFitter:
+    """
+    Finds the largest font size at which a text fits a width.
+    Texts are measured with tkinter.font instead of resizing a canvas item,
+    the size is binary searched and every result is memoised, so fitting a text again costs no Tk call.
+    """
+
+    def __init__(self, root: tk.Misc):
+        self.root = root
+        #font tuple: Font
+        self.fonts = {}
+        #(text, font, width): fitted font
+        self.fitted = {}
+
+    def measure(self, text, font):
+        tkFont = self.fonts.get(font)
+        if tkFont is None:
+            tkFont = self.fonts[font] = tkfont.Font(root=self.root, font=font)
+        return tkFont.measure(text)
+
+    def fit(self, text, font, width):
+        """
+        :param font: Font tuple of the text at full size, e.g. ('Helvetica', 12)
+        :return: Font tuple with the largest size which fits width, size 1 if none does
+        """
+        key = (text, font, width)
+        fitted = self.fitted.get(key)
+        if fitted is not None: return fitted
+        size = font[1]
+        if size > 1 and self.measure(text, font) > width:
+            #largest size in 1 to size-1 which fits
+            low, high = 1, size-1
+            size = 1
+            while low <= high:
+                mid = (low+high)//2
+                if self.measure(text, font[:1]+(mid,)+font[2:]) <= width:
+                    size = mid
+                    low = mid+1
+                else:
+                    high = mid-1
+        fitted = font[:1]+(size,)+font[2:]
+        if len(self.fitted) >= MAX_ENTRIES: self.fitted.clear()
+        self.fitted[key] = fitted
+        return fitted
+
+    def clear(self):
+        #measurements depend on the scaling
+        self.fonts.clear()
+        self.fitted.clear()
@@ -15,22 +15,6 @@ def getCanvasObjWidth(canvas, id):
     x1, _, x2, _ = canvas.bbox(id)
     return abs(x2-x1)
 
-def resizeCanvasText(canvas, id, width):
-    #remove the width limit of the object
-    canvas.itemconfigure(id, width=0)
-    if type(width) == "str":
-        width = canvas.winfo_fpixels(width)
-    #make system name resize dynamically
-    textHeight = getCanvasObjHeight(canvas, id)
-    textFont, textSize = canvas.itemcget(id, "font").split()
-    textSize = int(textSize)
-    #limit the width of the object
-    canvas.itemconfigure(id, width=width)
-    #while text size > 1pt and current text height > old text height
-    while textSize > 1 and getCanvasObjHeight(canvas, id) > textHeight:
-        textSize -= 1
-        canvas.itemconfigure(id, font=(textFont, textSize))
-
 def toPix(canvas, distance):
     try:
         return canvas.winfo_fpixels(distance)
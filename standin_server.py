@@ -0,0 +1,269 @@
+"""
+Local stand-in for the EDSM and DCoH APIs used by the workers.
+Point the plugin at it with NEXTSTOP_EDSM_API and NEXTSTOP_DCOH_API.
+Latency, payload size, X-Rate-Limit headers, 429 bursts, server errors, stalls and dropped connections
+can be injected to see how the workers cope.
+
+Usage: python standin_server.py [--port N] [--latency SEC] [--rate-limit N] [--drop-every N] ...
+"""
+
+import sys
+import json
+import time
+import math
+import argparse
+from threading import Thread, Lock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+#star type EDSM reports for each StarClass of the journal
+STAR_TYPES = {
+    "O": "O (Blue-White) Star", "B": "B (Blue-White) Star", "A": "A (Blue-White) Star",
+    "F": "F (White) Star", "G": "G (White-Yellow) Star", "K": "K (Yellow-Orange) Star",
+    "M": "M (Red dwarf) Star", "L": "L (Brown dwarf) Star", "T": "T (Brown dwarf) Star",
+    "Y": "Y (Brown dwarf) Star", "TTS": "T Tauri Star", "N": "Neutron Star", "H": "Black Hole",
+    "DA": "White Dwarf (DA) Star", "DB": "White Dwarf (DB) Star", "DC": "White Dwarf (DC) Star",
+}
+
+EDSM_PATH = "/api-v1/systems"
+DCOH_PATH = "/api/v1/overwatch/systems"
+#injected faults
+DROP = "drop"
+THROTTLED = "throttled"
+ERROR = "error"
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request()
+
+    def handle_request(self):
+        server = self.server.standIn
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length > 0 else b""
+        fault, delay = server.getFault(url.path)
+        if delay > 0: time.sleep(delay)
+        if fault == DROP:
+            #close without a response, the client sees a connection error
+            self.close_connection = True
+            return
+        headers = server.getRateLimitHeaders(url.path, fault == THROTTLED)
+        if fault == THROTTLED:
+            self.sendJSON({"error": "Too Many Requests"}, 429, headers)
+        elif fault == ERROR:
+            self.sendJSON({"error": "Service Unavailable"}, 503, headers)
+        elif url.path == EDSM_PATH:
+            names = getSystemNames(body, url.query)
+            self.sendJSON(server.getSystems(names), 200, headers)
+        elif url.path == DCOH_PATH:
+            self.sendJSON(server.getOverwatch())
+        else:
+            self.sendJSON({"error": "not found"}, 404)
+
+    def sendJSON(self, data, code=200, headers=None):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            #the client timed out while the request stalled
+            self.close_connection = True
+
+def getSystemNames(body, query):
+    #the plugin posts JSON, EDSM itself takes systemName[] form or query parameters
+    if body[:1] == b"{":
+        names = json.loads(body).get("systemName", [])
+        return [names] if isinstance(names, str) else names
+    params = parse_qs(body.decode("utf-8")) if body else parse_qs(query)
+    return params.get("systemName[]", []) + params.get("systemName", [])
+
+class StandInServer:
+    """
+    EDSM api-v1/systems and DCoH overwatch/systems served from memory on a background thread.
+    Faults only apply to the EDSM endpoint, the attributes can be changed while the server runs.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        #seconds added to every response
+        self.latency = latency
+        #extra bytes in every system row
+        self.rowPadding = 0
+        #size of the request bucket, 0 = no X-Rate-Limit headers
+        self.rateLimit = 0
+        #seconds an empty bucket takes to refill, like EDSM it refills evenly
+        self.rateWindow = 60
+        self.tokens = None
+        self.updated = time.monotonic()
+        #number of following requests answered with 429
+        self.throttleBurst = 0
+        #send X-Rate-Limit-Reset with a 429 of a burst
+        self.throttleHeaders = True
+        #every nth request fails, 0 = never
+        self.dropEvery = 0
+        self.errorEvery = 0
+        self.stallEvery = 0
+        #seconds a stalled request sleeps, longer than the client read timeout to cause a timeout
+        self.stall = 0.0
+        #number of EDSM requests, faults included
+        self.edsmCount = 0
+        #fault: number of times it was injected
+        self.faults = {}
+        self.lock = Lock()
+        #system name: (id64, star type)
+        self.systems = {}
+        #systemAddress: thargoid state, "Titan" for maelstroms
+        self.thargoidSystems = {}
+        #path: number of requests
+        self.requests = {}
+        self.httpd = ThreadingHTTPServer((host, port), StandInHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.standIn = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def addSystems(self, rows):
+        """
+        :param rows: (system name, id64, star type), systems with an empty star type have no primary star
+        """
+        with self.lock:
+            for name, id64, starType in rows:
+                self.systems[name] = (id64, starType)
+
+    def addRoute(self, route):
+        #NavRoute.json entries, every StarClass gets its EDSM star type
+        self.addSystems((dest["StarSystem"], dest["SystemAddress"], STAR_TYPES.get(dest.get("StarClass", ""), "")) for dest in route)
+
+    def countRequest(self, urlPath):
+        with self.lock:
+            self.requests[urlPath] = self.requests.get(urlPath, 0) + 1
+
+    def throttle(self, count):
+        #answer the next count EDSM requests with 429
+        with self.lock:
+            self.throttleBurst += count
+
+    def getFault(self, urlPath):
+        """
+        :return: Injected fault or None and seconds to wait before answering
+        """
+        self.countRequest(urlPath)
+        if urlPath != EDSM_PATH: return None, self.latency
+        with self.lock:
+            self.edsmCount += 1
+            count = self.edsmCount
+            delay = self.latency
+            fault = None
+            if self.stallEvery > 0 and count % self.stallEvery == 0:
+                delay += self.stall
+                self.faults["stall"] = self.faults.get("stall", 0) + 1
+            if self.dropEvery > 0 and count % self.dropEvery == 0:
+                fault = DROP
+            elif self.errorEvery > 0 and count % self.errorEvery == 0:
+                fault = ERROR
+            elif self.throttleBurst > 0:
+                self.throttleBurst -= 1
+                fault = THROTTLED
+            elif self.rateLimit > 0:
+                self.refill()
+                if self.tokens < 1:
+                    fault = THROTTLED
+                else:
+                    self.tokens -= 1
+            if fault: self.faults[fault] = self.faults.get(fault, 0) + 1
+        return fault, delay
+
+    def refill(self):
+        now = time.monotonic()
+        if self.tokens is None: self.tokens = self.rateLimit
+        self.tokens = min(self.rateLimit, self.tokens + (now - self.updated)*self.rateLimit/self.rateWindow)
+        self.updated = now
+
+    def getRateLimitHeaders(self, urlPath, throttled=False):
+        if urlPath != EDSM_PATH: return {}
+        with self.lock:
+            if self.rateLimit > 0:
+                self.refill()
+                #seconds until the bucket is full again
+                reset = math.ceil((self.rateLimit - self.tokens)*self.rateWindow/self.rateLimit)
+                return {"X-Rate-Limit-Limit": self.rateLimit, "X-Rate-Limit-Remaining": math.floor(self.tokens), "X-Rate-Limit-Reset": reset}
+            #a 429 burst without a rate limit tells the client when to retry unless the headers are off
+            return {"X-Rate-Limit-Reset": 1} if throttled and self.throttleHeaders else {}
+
+    def getSystems(self, names):
+        rows = []
+        with self.lock:
+            for name in names:
+                if name not in self.systems: continue
+                id64, starType = self.systems[name]
+                row = {"name": name, "id64": id64}
+                if self.rowPadding > 0: row["information"] = {"padding": "x"*self.rowPadding}
+                if starType: row["primaryStar"] = {"type": starType, "name": name, "isScoopable": starType[0] in "OBAFGKM"}
+                rows.append(row)
+        return rows
+
+    def getOverwatch(self):
+        with self.lock:
+            maelstroms = [{"systemAddress": address} for address, state in self.thargoidSystems.items() if state == "Titan"]
+            systems = [{"systemAddress": address, "thargoidLevel": {"name": state}} for address, state in self.thargoidSystems.items() if state != "Titan"]
+        return {"maelstroms": maelstroms, "systems": systems}
+
+    def start(self):
+        self.thread = Thread(target=self.httpd.serve_forever, name="Stand-in server")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Local EDSM and DCoH stand-in.")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--padding", type=int, default=0, help="extra bytes in every system row")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests in a full bucket, 0 = unlimited")
+    parser.add_argument("--rate-window", type=int, default=60, help="seconds an empty bucket takes to refill")
+    parser.add_argument("--no-throttle-headers", action="store_true", help="send 429s without X-Rate-Limit headers")
+    parser.add_argument("--drop-every", type=int, default=0, help="close every nth connection without a response")
+    parser.add_argument("--error-every", type=int, default=0, help="answer every nth request with 503")
+    parser.add_argument("--stall-every", type=int, default=0, help="stall every nth request")
+    parser.add_argument("--stall", type=float, default=0.0, help="seconds a stalled request sleeps")
+    args = parser.parse_args(argv[1:])
+    server = StandInServer(port=args.port, latency=args.latency)
+    server.rowPadding = args.padding
+    server.rateLimit = args.rate_limit
+    server.rateWindow = args.rate_window
+    server.throttleHeaders = not args.no_throttle_headers
+    server.dropEvery = args.drop_every
+    server.errorEvery = args.error_every
+    server.stallEvery = args.stall_every
+    server.stall = args.stall
+    print(f"Serving on {server.url}, Ctrl+C to stop.")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
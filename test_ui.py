@@ -90,7 +90,7 @@ def run_test():
         if board.currentIndex+v < len(board.route):
             # Mocking the ship moving to the next system's position
             print("\nfake jump")
-            target_pos = board.route[board.currentIndex+v]["pos"]
+            target_pos = board.route[board.currentIndex+v].pos
             board.setCurrentPos(target_pos)
             board.updateCanvas()
 